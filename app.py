@@ -7,26 +7,35 @@ A web dashboard for extracting and downloading reports from the database.
 import os
 import io
 import csv
+import gzip
 import json
+import re
 import uuid
+import hashlib
+import queue
+import sqlite3
 import threading
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email import encoders
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
+from collections import Counter, OrderedDict
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import groupby, islice
+from operator import itemgetter
 
 from flask import Flask, render_template, request, jsonify, send_file, Response, session, redirect, url_for, flash
 from dotenv import load_dotenv
-from functools import wraps
+from functools import wraps, lru_cache, partial
 import secrets
 
 try:
     import paramiko
-    import pandas as pd
+    import numpy as np
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import letter, landscape
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -34,10 +43,10 @@ try:
 except ImportError as e:
     print(f"Missing required package: {e}")
     print("\nInstall required packages with:")
-    print("pip install flask paramiko python-dotenv pandas reportlab openpyxl")
+    print("pip install flask paramiko python-dotenv numpy reportlab openpyxl")
     exit(1)
 
-from config import PROJECTS, REPORTS
+from config import PROJECTS, REPORTS, REPORTS_BY_ID
 
 app = Flask(__name__)
 
@@ -50,43 +59,120 @@ ADMIN_PASSWORD = "wakecap@2026!"
 
 # Background job storage directory
 JOBS_DIR = Path('/tmp/gps_report_jobs')
+JOBS_DB = JOBS_DIR / 'jobs.db'
+
+# Ignition values (from EXTRACTVALUE(other, '//ignition')) that mean engine on
+IGNITION_TRUE_VALUES = frozenset({'true', 'True', 'TRUE', '1', True})
+
+# Device statuses (from update_device_data.calculate_status) counted as offline in SIM insight
+OFFLINE_STATUSES = frozenset({'Offline', 'Inactive'})
+
+# Device statuses broken down per SIM provider in SIM insight
+PROVIDER_STATUS_BUCKETS = ('Online', 'Recent', 'Offline', 'Inactive')
+
+# Shared event counts for fleet vehicles with no events in the period (read-only)
+ZERO_EVENTS = {'h_accel': 0, 'h_brake': 0, 'seatbelt': 0, 'sos': 0}
+
+# Seconds a user's parsed geofences are reused before re-checking the database
+GEOFENCE_CACHE_TTL = 300
+
+# Seconds a project user's email -> id lookup is reused before querying again
+USER_CACHE_TTL = 300
+
+# Maximum table rows rendered into PDF exports
+PDF_MAX_ROWS = 500
+
+# Devices per batched positions query (a 100-device fleet query is ~173KB of SQL, which
+# is why SSHMySQLExecutor sends queries on stdin rather than as a command-line argument)
+POSITION_BATCH_SIZE = 100
+
+# Rows per geofence-resolution chunk when streaming standard reports
+REPORT_CHUNK_SIZE = 10000
+
+# Seconds a report preview is kept for paging before it is regenerated
+PREVIEW_CACHE_TTL = 300
+
+# Seconds /api/preview waits for a preview before answering 202 (the client polls)
+PREVIEW_WAIT_SECONDS = 2
+
+# Maximum report previews cached per process
+PREVIEW_CACHE_SIZE = 128
+
+# Concurrent preview generations per process (kept apart from the report job pool)
+PREVIEW_WORKERS = 2
+
+# Smallest JSON response body (bytes) worth gzipping
+GZIP_MIN_SIZE = 1024
+
+# Concurrent report jobs per process; extra jobs wait in the pool queue as 'pending'
+MAX_REPORT_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+# Idle SSH database connections kept open for reuse between jobs/requests
+DB_POOL_SIZE = MAX_REPORT_WORKERS
 
 
 class JobManager:
-    """Manage background report generation jobs with file-based persistence."""
+    """Manage background report generation jobs persisted in a SQLite database."""
 
     def __init__(self):
         JOBS_DIR.mkdir(exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                completed_at TEXT,
+                error TEXT,
+                result_file TEXT,
+                email_sent INTEGER,
+                email_recipient TEXT,
+                email_error TEXT,
+                etag TEXT
+            )
+        """)
+        try:
+            # Job databases created before result ETags were stored
+            conn.execute("ALTER TABLE jobs ADD COLUMN etag TEXT")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
         self._cleanup_stale_jobs()
         self._start_cleanup_thread()
 
+    def _connect(self):
+        """Return this thread's SQLite connection (autocommit, WAL), opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(JOBS_DB, isolation_level=None, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
     def _cleanup_stale_jobs(self):
         """Clean up stale jobs (older than 2 hours) on startup and periodically."""
         try:
-            for job_file in JOBS_DIR.glob('*.json'):
-                try:
-                    job = json.loads(job_file.read_text())
-                    # Use completed_at for finished jobs, created_at for pending/processing
-                    if job.get('completed_at'):
-                        ref_time = datetime.fromisoformat(job['completed_at'])
-                    else:
-                        ref_time = datetime.fromisoformat(job.get('created_at', ''))
-                    age_hours = (datetime.now() - ref_time).total_seconds() / 3600
-                    if age_hours > 2:
-                        job_file.unlink(missing_ok=True)
-                        # Also clean up result file if it exists
-                        if job.get('result_file'):
-                            Path(job['result_file']).unlink(missing_ok=True)
-                except (json.JSONDecodeError, ValueError, KeyError):
-                    # Invalid job file, remove it
-                    job_file.unlink(missing_ok=True)
+            # Use completed_at for finished jobs, created_at for pending/processing
+            cutoff = (datetime.now() - timedelta(hours=2)).isoformat()
+            conn = self._connect()
+            stale = conn.execute(
+                "SELECT id, result_file FROM jobs WHERE COALESCE(completed_at, created_at) < ?",
+                (cutoff,)
+            ).fetchall()
+            for job_id, result_file in stale:
+                # Also clean up result file if it exists
+                if result_file:
+                    Path(result_file).unlink(missing_ok=True)
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id, _ in stale])
         except Exception:
             pass  # Don't fail startup if cleanup fails
 
     def _start_cleanup_thread(self):
         """Start background thread to periodically clean up old jobs."""
-        import threading
-
         def cleanup_loop():
             while True:
                 import time
@@ -99,104 +185,85 @@ class JobManager:
     def create_job(self, job_type, params):
         """Create job and return job_id."""
         job_id = str(uuid.uuid4())[:8]
-        job_data = {
-            'id': job_id,
-            'type': job_type,
-            'params': params,
-            'status': 'pending',
-            'progress': 0,
-            'created_at': datetime.now().isoformat(),
-            'error': None,
-            'result_file': None
-        }
-        self._save_job(job_id, job_data)
+        self._connect().execute(
+            "INSERT INTO jobs (id, type, params, status, progress, created_at) VALUES (?, ?, ?, 'pending', 0, ?)",
+            (job_id, job_type, json.dumps(params), datetime.now().isoformat())
+        )
         return job_id
 
     def update_progress(self, job_id, progress, status='processing'):
         """Update job progress (0-100)."""
-        try:
-            job = self._load_job(job_id)
-            job['progress'] = progress
-            job['status'] = status
-            self._save_job(job_id, job)
-        except FileNotFoundError:
-            pass  # Job might have been cleaned up
-
-    def complete_job(self, job_id, result_file):
-        """Mark job as complete with result file path."""
-        try:
-            job = self._load_job(job_id)
-            job['status'] = 'complete'
-            job['progress'] = 100
-            job['result_file'] = result_file
-            job['completed_at'] = datetime.now().isoformat()
-            self._save_job(job_id, job)
-        except FileNotFoundError:
-            pass
+        self._connect().execute(
+            "UPDATE jobs SET progress = ?, status = ? WHERE id = ?",
+            (progress, status, job_id)
+        )
+
+    def complete_job(self, job_id, result_file, email_sent=False, email_recipient=None, email_error=None):
+        """Mark job as complete with result file path, its content ETag and email delivery status."""
+        # Hash the result once here so downloads can answer conditional requests cheaply
+        digest = hashlib.blake2b(digest_size=16)
+        with open(result_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+
+        self._connect().execute(
+            """UPDATE jobs SET status = 'complete', progress = 100, result_file = ?, completed_at = ?,
+                              email_sent = ?, email_recipient = ?, email_error = ?, etag = ?
+               WHERE id = ?""",
+            (result_file, datetime.now().isoformat(), int(email_sent), email_recipient, email_error,
+             digest.hexdigest(), job_id)
+        )
 
     def fail_job(self, job_id, error):
         """Mark job as failed."""
-        try:
-            job = self._load_job(job_id)
-            job['status'] = 'failed'
-            job['error'] = str(error)
-            job['completed_at'] = datetime.now().isoformat()
-            self._save_job(job_id, job)
-        except FileNotFoundError:
-            pass
+        self._connect().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, completed_at = ? WHERE id = ?",
+            (str(error), datetime.now().isoformat(), job_id)
+        )
 
     def get_status(self, job_id):
-        """Get job status."""
-        return self._load_job(job_id)
-
-    def _save_job(self, job_id, data):
-        """Atomically save job data to prevent corruption from concurrent reads."""
-        import tempfile
-        job_file = JOBS_DIR / f'{job_id}.json'
-        # Write to temp file first, then rename (atomic on POSIX)
-        fd, tmp_path = tempfile.mkstemp(dir=JOBS_DIR, suffix='.tmp')
-        try:
-            with os.fdopen(fd, 'w') as f:
-                json.dump(data, f)
-            os.replace(tmp_path, job_file)  # Atomic rename
-        except Exception:
-            # Clean up temp file on error
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
-            raise
-
-    def _load_job(self, job_id):
-        """Load job data with retry for transient failures."""
-        import time
-        job_file = JOBS_DIR / f'{job_id}.json'
-
-        # Retry up to 3 times with short delays for transient issues
-        max_retries = 3
-        for attempt in range(max_retries):
-            if not job_file.exists():
-                raise FileNotFoundError(f'Job {job_id} not found')
-
-            try:
-                content = job_file.read_text()
-                if content.strip():
-                    return json.loads(content)
-                # Empty file - might be mid-write, retry
-            except json.JSONDecodeError:
-                # Partial write - retry
-                pass
-
-            if attempt < max_retries - 1:
-                time.sleep(0.1)  # Brief delay before retry
-
-        # All retries failed
-        raise ValueError(f'Job file {job_id} is empty or corrupted after {max_retries} retries')
+        """Get job status. Raises KeyError if the job doesn't exist (or was cleaned up)."""
+        row = self._connect().execute(
+            """SELECT id, type, params, status, progress, created_at, error, result_file,
+                      completed_at, email_sent, email_recipient, email_error, etag
+               FROM jobs WHERE id = ?""",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f'Job {job_id} not found')
+
+        (job_id, job_type, params, status, progress, created_at, error, result_file,
+         completed_at, email_sent, email_recipient, email_error, etag) = row
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'params': json.loads(params),
+            'status': status,
+            'progress': progress,
+            'created_at': created_at,
+            'error': error,
+            'result_file': result_file
+        }
+        if completed_at:
+            job['completed_at'] = completed_at
+        if email_sent is not None:
+            job['email_sent'] = bool(email_sent)
+            job['email_recipient'] = email_recipient
+            job['email_error'] = email_error
+        if etag:
+            job['etag'] = etag
+        return job
 
 
 # Initialize job manager
 job_manager = JobManager()
 
+# Bounded worker pool for background report jobs
+job_pool = ThreadPoolExecutor(max_workers=MAX_REPORT_WORKERS, thread_name_prefix='report')
+
+# Small separate pool for report previews, so repeated previews can't hold up report jobs
+preview_pool = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix='preview')
+
 
 def load_config():
     """Load configuration from .env file."""
@@ -304,14 +371,27 @@ class SSHMySQLExecutor:
             username=self.config["ssh_user"],
             key_filename=str(ssh_key_path),
         )
+        # Keep pooled connections from being dropped while idle
+        self.ssh_client.get_transport().set_keepalive(60)
+
+    def is_connected(self):
+        """Return True if the SSH transport is still usable."""
+        transport = self.ssh_client.get_transport() if self.ssh_client else None
+        return transport is not None and transport.is_active()
 
     def close(self):
         """Close SSH connection."""
         if self.ssh_client:
             self.ssh_client.close()
 
-    def execute(self, query, params=None):
-        """Execute a query and return results."""
+    def _start_query(self, query, params=None):
+        """
+        Substitute escaped params into the query and start it in a mysql CLI process.
+
+        The SQL is sent on the command's stdin rather than as a -e argument, so it never
+        passes through the remote shell and its length isn't capped by the per-argument
+        limit (128KB on Linux). Returns the command's (stdout, stderr) channel files.
+        """
         if params:
             escaped_params = []
             for p in params:
@@ -322,18 +402,28 @@ class SSHMySQLExecutor:
                 else:
                     escaped = str(p).replace("\\", "\\\\").replace("'", "\\'")
                     escaped_params.append(f"'{escaped}'")
-            for param in escaped_params:
-                query = query.replace("%s", param, 1)
+            # Single pass so substituted values that contain %s are left alone
+            params_iter = iter(escaped_params)
+            query = re.sub(r'%s', lambda m: next(params_iter), query)
 
-        cmd = f'sudo mysql -N -B {self.db_name} -e "{query}"'
         # Set timeout for long-running queries (10 minutes max)
-        stdin, stdout, stderr = self.ssh_client.exec_command(cmd, timeout=600)
-        output = stdout.read().decode('utf-8', errors='replace')
-        error = stderr.read().decode('utf-8', errors='replace')
+        stdin, stdout, stderr = self.ssh_client.exec_command(f'sudo mysql -N -B {self.db_name}', timeout=600)
+        stdin.write(f"{query.strip().rstrip(';')};\n".encode('utf-8'))
+        stdin.channel.shutdown_write()
+        return stdout, stderr
 
-        if error and "ERROR" in error:
-            raise Exception(f"MySQL Error: {error}")
+    def _check_result(self, stdout, stderr):
+        """Raise if the mysql command failed: a non-zero exit status or an ERROR on stderr."""
+        error = stderr.read().decode('utf-8', errors='replace')
+        status = stdout.channel.recv_exit_status()
+        if status != 0 or "ERROR" in error:
+            raise Exception(f"MySQL Error: {error.strip() or f'mysql exited with status {status}'}")
 
+    def execute(self, query, params=None):
+        """Execute a query and return results."""
+        stdout, stderr = self._start_query(query, params)
+        output = stdout.read().decode('utf-8', errors='replace')
+        self._check_result(stdout, stderr)
         return output
 
     def fetchall(self, query, params=None):
@@ -353,6 +443,26 @@ class SSHMySQLExecutor:
             rows.append(tuple(values))
         return rows
 
+    def iterrows(self, query, params=None):
+        """Execute SELECT and yield rows as tuples while streaming the output.
+
+        Rows are parsed line by line as they arrive over the SSH channel instead of
+        buffering the whole result set. MySQL errors are raised once the output ends.
+        """
+        stdout, stderr = self._start_query(query, params)
+        try:
+            for raw_line in stdout.channel.makefile('rb'):
+                line = raw_line.decode('utf-8', errors='replace').rstrip('\n')
+                if not line:
+                    continue
+                yield tuple(None if v == 'NULL' or v == '\\N' else v for v in line.split('\t'))
+        except GeneratorExit:
+            # Caller stopped early (e.g. PDF row limit): drop the rest of the output
+            stdout.channel.close()
+            raise
+
+        self._check_result(stdout, stderr)
+
     def fetchone(self, query, params=None):
         """Execute SELECT and return first row as tuple."""
         rows = self.fetchall(query, params)
@@ -368,25 +478,67 @@ class SSHMySQLExecutor:
         return columns
 
 
+# Idle connected executors, most recently used first
+db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
 @contextmanager
 def get_db_connection():
-    """Create database connection via SSH."""
-    config = load_config()
-    executor = SSHMySQLExecutor(config)
+    """Borrow a pooled database connection via SSH, connecting a new one if none is idle."""
+    try:
+        executor = db_pool.get_nowait()
+    except queue.Empty:
+        executor = None
+
+    if executor is None or not executor.is_connected():
+        if executor is not None:
+            executor.close()
+        executor = SSHMySQLExecutor(load_config())
+        try:
+            executor.connect()
+        except Exception:
+            executor.close()
+            raise
+
     try:
-        executor.connect()
         yield executor
     finally:
-        executor.close()
+        # Return healthy connections to the pool, close the rest
+        pooled = False
+        if executor.is_connected():
+            try:
+                db_pool.put_nowait(executor)
+                pooled = True
+            except queue.Full:
+                pass
+        if not pooled:
+            executor.close()
+
+
+# Users found by email: email -> (fetched_at, user)
+user_cache = {}
 
 
 def get_user_by_email(executor, email):
-    """Fetch user by email address."""
-    columns = executor.get_columns('users')
-    user = executor.fetchone("SELECT * FROM users WHERE email = %s", (email,))
+    """
+    Fetch user (id and email) by email address.
+
+    Found users are cached per process for USER_CACHE_TTL seconds (unknown emails are
+    always re-queried). The returned dict is shared, so callers must not modify it.
+    """
+    import time
+
+    now = time.monotonic()
+    cached = user_cache.get(email)
+    if cached and now - cached[0] < USER_CACHE_TTL:
+        return cached[1]
+
+    user = executor.fetchone("SELECT id, email FROM users WHERE email = %s", (email,))
     if not user:
         return None
-    return dict(zip(columns, user))
+    user = dict(zip(('id', 'email'), user))
+    user_cache[email] = (now, user)
+    return user
 
 
 def point_in_polygon(lat, lng, polygon):
@@ -412,19 +564,103 @@ def point_in_polygon(lat, lng, polygon):
     return inside
 
 
+def polygon_vertices(polygon):
+    """
+    Convert a polygon's [{'lat': ..., 'lng': ...}, ...] points into a contiguous
+    (n, 2) float64 array of (lat, lng) rows. Returns None if any point is malformed.
+    """
+    try:
+        return np.array([(float(p['lat']), float(p['lng'])) for p in polygon], dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def point_in_vertices(lat, lng, verts):
+    """
+    Array version of point_in_polygon() for a polygon from polygon_vertices().
+    Tests every edge at once instead of looping over them in Python.
+    """
+    n = len(verts)
+    if n < 3:
+        return False
+
+    yi, xi = verts[:, 0], verts[:, 1]
+    prev = np.roll(verts, 1, axis=0)
+    yj, xj = prev[:, 0], prev[:, 1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crosses = ((yi > lat) != (yj > lat)) & (lng < (xj - xi) * (lat - yi) / (yj - yi) + xi)
+    return bool(np.count_nonzero(crosses) & 1)
+
+
+def geofence_bbox(gf):
+    """
+    Compute a (min_lat, min_lng, max_lat, max_lng) bounding box for a parsed geofence.
+    Returns None when the shape can't be bounded, so the geofence is always tested.
+    """
+    import math
+
+    try:
+        if gf['type'] == 'polygon':
+            lats = [float(p['lat']) for p in gf['polygon']]
+            lngs = [float(p['lng']) for p in gf['polygon']]
+            return (min(lats), min(lngs), max(lats), max(lngs))
+
+        clat, clng = gf['center']['lat'], gf['center']['lng']
+
+        # Widest lat/lng offsets reachable within the radius on a sphere, padded slightly
+        angle = gf['radius'] / 6371000 * 1.01
+        if angle >= math.pi / 2:
+            return None
+        dlat = math.degrees(angle)
+        cos_lat = math.cos(math.radians(clat))
+        if cos_lat <= math.sin(angle):
+            return (clat - dlat, -180.0, clat + dlat, 180.0)
+        dlng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+        return (clat - dlat, clng - dlng, clat + dlat, clng + dlng)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+# Parsed geofences per user: user_id -> (checked_at, version, geofences)
+geofence_cache = {}
+
+
 def load_geofences_for_user(executor, user_id):
     """
     Load all geofences for a user and return them as a list of parsed polygons.
-    Returns list of {'id': int, 'name': str, 'polygon': [{'lat': float, 'lng': float}, ...]}
+    Returns list of {'id': int, 'name': str, 'polygon': [{'lat': float, 'lng': float}, ...], 'bbox': tuple, 'verts': ndarray}
+    (circles carry 'center': {'lat': float, 'lng': float} and 'radius': float instead of 'polygon')
+
+    Results are cached per process for GEOFENCE_CACHE_TTL seconds; after that a cheap
+    count/updated_at probe decides whether the cached list can be kept. The returned
+    list is shared, so callers must not modify it.
     """
     import json
+    import time
+
+    now = time.monotonic()
+    cached = geofence_cache.get(user_id)
+    if cached and now - cached[0] < GEOFENCE_CACHE_TTL:
+        return cached[2]
 
-    geofences_query = f"""
+    try:
+        version = executor.fetchone(
+            "SELECT COUNT(*), MAX(updated_at) FROM geofences WHERE user_id = %s AND active = 1",
+            (user_id,)
+        )
+    except Exception:
+        version = None  # Can't tell whether geofences changed, so reload them
+    if cached and version is not None and cached[1] == version:
+        geofence_cache[user_id] = (now, version, cached[2])
+        return cached[2]
+
+    geofences_query = """
         SELECT id, name, coordinates, type, radius, center
         FROM geofences
-        WHERE user_id = {user_id} AND active = 1
+        WHERE user_id = %s AND active = 1
     """
-    rows = executor.fetchall(geofences_query)
+    rows = executor.fetchall(geofences_query, (user_id,))
 
     geofences = []
     for row in rows:
@@ -443,18 +679,35 @@ def load_geofences_for_user(executor, user_id):
             except (json.JSONDecodeError, TypeError):
                 continue
         elif gf_type == 'circle' and center and radius:
+            # Centers are stored as {"lat": .., "lng": ..} or [lat, lng], possibly with
+            # string values; they are converted to floats once here, and circles whose
+            # center doesn't parse are skipped (they could never match a point)
             try:
                 center_point = json.loads(center) if isinstance(center, str) else center
+                if isinstance(center_point, dict):
+                    clat, clng = float(center_point.get('lat', 0)), float(center_point.get('lng', 0))
+                elif isinstance(center_point, list) and len(center_point) >= 2:
+                    clat, clng = float(center_point[0]), float(center_point[1])
+                else:
+                    continue
                 geofences.append({
                     'id': gf_id,
                     'name': name,
                     'type': 'circle',
-                    'center': center_point,
-                    'radius': float(radius) if radius else 0
+                    'center': {'lat': clat, 'lng': clng},
+                    'radius': float(radius)
                 })
             except (json.JSONDecodeError, TypeError, ValueError):
                 continue
 
+    # Bounding boxes let find_geofence_for_point() skip most shapes without exact math;
+    # vertex arrays are built once here so the exact test doesn't walk the dicts again
+    for gf in geofences:
+        gf['bbox'] = geofence_bbox(gf)
+        if gf['type'] == 'polygon':
+            gf['verts'] = polygon_vertices(gf['polygon'])
+
+    geofence_cache[user_id] = (now, version, geofences)
     return geofences
 
 
@@ -466,18 +719,21 @@ def find_geofence_for_point(lat, lng, geofences):
     import math
 
     for gf in geofences:
+        bbox = gf.get('bbox')
+        if bbox and not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3]):
+            continue
+
         if gf['type'] == 'polygon':
-            if point_in_polygon(lat, lng, gf['polygon']):
+            verts = gf.get('verts')
+            if verts is not None:
+                inside = point_in_vertices(lat, lng, verts)
+            else:
+                inside = point_in_polygon(lat, lng, gf['polygon'])
+            if inside:
                 return gf['name']
         elif gf['type'] == 'circle':
             # Check if point is within circle radius (approximate using Haversine)
-            center = gf['center']
-            if isinstance(center, dict):
-                clat, clng = center.get('lat', 0), center.get('lng', 0)
-            elif isinstance(center, list) and len(center) >= 2:
-                clat, clng = center[0], center[1]
-            else:
-                continue
+            clat, clng = gf['center']['lat'], gf['center']['lng']
 
             # Haversine distance approximation
             R = 6371000  # Earth radius in meters
@@ -493,6 +749,194 @@ def find_geofence_for_point(lat, lng, geofences):
     return None
 
 
+def find_geofences_for_points(lats, lngs, geofences):
+    """
+    Vectorized find_geofence_for_point() over numpy arrays of latitudes and longitudes.
+    Returns a list with the geofence name (or None) for each point; the first matching
+    geofence wins, as in the single-point version.
+    """
+    names = [None] * len(lats)
+    unmatched = np.ones(len(lats), dtype=bool)
+
+    for gf in geofences:
+        if not unmatched.any():
+            break
+
+        candidates = unmatched.copy()
+        bbox = gf.get('bbox')
+        if bbox:
+            candidates &= (lats >= bbox[0]) & (lats <= bbox[2]) & (lngs >= bbox[1]) & (lngs <= bbox[3])
+        idx = np.flatnonzero(candidates)
+        if not idx.size:
+            continue
+        lat, lng = lats[idx], lngs[idx]
+
+        if gf['type'] == 'polygon':
+            verts = gf.get('verts')
+            if verts is None:
+                verts = polygon_vertices(gf['polygon'])
+            if verts is None or len(verts) < 3:
+                continue
+            n = len(verts)
+
+            # Ray casting, one polygon edge at a time across all candidate points
+            hit = np.zeros(idx.size, dtype=bool)
+            j = n - 1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for i in range(n):
+                    yi, xi = verts[i, 0], verts[i, 1]
+                    yj, xj = verts[j, 0], verts[j, 1]
+                    crosses = (yi > lat) != (yj > lat)
+                    hit ^= crosses & (lng < (xj - xi) * (lat - yi) / (yj - yi) + xi)
+                    j = i
+        elif gf['type'] == 'circle':
+            clat, clng = gf['center']['lat'], gf['center']['lng']
+
+            # Haversine distance approximation
+            R = 6371000  # Earth radius in meters
+            dlat = np.radians(lat - clat)
+            dlng = np.radians(lng - clng)
+            a = np.sin(dlat/2)**2 + np.cos(np.radians(clat)) * np.cos(np.radians(lat)) * np.sin(dlng/2)**2
+            c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+            hit = R * c <= gf['radius']
+        else:
+            continue
+
+        matched = idx[hit]
+        unmatched[matched] = False
+        for i in matched.tolist():
+            names[i] = gf['name']
+
+    return names
+
+
+def fetch_position_table_ids(executor, device_ids):
+    """
+    Return the device IDs (in the given order) that have a gpswox_traccar.positions_{id} table.
+    Lets batched UNION ALL queries skip devices whose table was never created.
+    """
+    if not device_ids:
+        return []
+
+    table_names = [f'positions_{device_id}' for device_id in device_ids]
+    tables_query = f"""
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = 'gpswox_traccar'
+        AND table_name IN ({', '.join(['%s'] * len(table_names))})
+    """
+    existing = {row[0] for row in executor.fetchall(tables_query, table_names)}
+    return [device_id for device_id, name in zip(device_ids, table_names) if name in existing]
+
+
+def fetch_position_batches(device_ids, fetch, results, what):
+    """
+    Call fetch(batch) for each POSITION_BATCH_SIZE batch of device_ids; fetch stores what
+    it gets in results, keyed by device ID.
+
+    One failing device table fails the whole query of its batch (or, for one statement
+    per device, the rest of it), so a failed batch is retried one device at a time
+    (skipping devices already stored) and only devices that also fail on their own are
+    left out.
+    """
+    for batch_start in range(0, len(device_ids), POSITION_BATCH_SIZE):
+        batch = device_ids[batch_start:batch_start + POSITION_BATCH_SIZE]
+        try:
+            fetch(batch)
+        except Exception as e:
+            print(f"Warning: Failed to {what} for a batch of {len(batch)} devices, retrying one at a time: {e}")
+            for device_id in batch:
+                if device_id in results:
+                    continue
+                try:
+                    fetch([device_id])
+                except Exception as e:
+                    print(f"Warning: Failed to {what} for device {device_id}: {e}")
+
+
+def build_trip_segments(positions, geofences, speed_threshold):
+    """
+    Fold a time-ordered stream of position rows into parked/idle/run segments.
+
+    Positions are (time, speed, latitude, longitude, distance, ignition) tuples and are
+    consumed one at a time, so the caller can pass a streaming row iterator.
+    Segment durations are filled in later by the caller.
+    """
+    segments = []
+    current_segment = None
+    last_time = None
+    # Running speed totals for the open segment (only accumulated for run segments)
+    speed_sum = 0.0
+    speed_count = 0
+
+    for pos in positions:
+        pos_time, speed, lat, lng, distance, ignition = pos
+
+        # Parse values
+        try:
+            speed = float(speed) if speed else 0.0
+            distance = float(distance) if distance else 0.0
+            lat = float(lat) if lat else 0.0
+            lng = float(lng) if lng else 0.0
+        except (ValueError, TypeError):
+            speed = 0.0
+            distance = 0.0
+            lat = 0.0
+            lng = 0.0
+
+        # Determine state based on ignition and speed
+        ignition_on = ignition in IGNITION_TRUE_VALUES
+
+        if not ignition_on:
+            state = 'parked'
+        elif speed > speed_threshold:
+            state = 'run'
+        else:
+            state = 'idle'
+
+        # Create or extend segment
+        if current_segment is not None and current_segment['state'] == state:
+            # Continue same segment
+            if state == 'run':
+                current_segment['distance'] += distance
+                speed_sum += speed
+                speed_count += 1
+        else:
+            if current_segment is not None:
+                # State changed - close current segment and start new one
+                current_segment['stop_time'] = last_time
+
+                # Calculate average speed for run segments
+                current_segment['avg_speed'] = speed_sum / speed_count if speed_count else 0.0
+
+                segments.append(current_segment)
+
+            # Look up geofence for new segment location
+            geofence_name = find_geofence_for_point(lat, lng, geofences) if lat and lng else None
+
+            # Start new segment
+            current_segment = {
+                'start_time': pos_time,
+                'state': state,
+                'start_lat': lat,
+                'start_lng': lng,
+                'geofence': geofence_name,
+                'distance': 0.0
+            }
+            speed_sum = 0.0
+            speed_count = 0
+
+        last_time = pos_time
+
+    # Close last segment
+    if current_segment:
+        current_segment['stop_time'] = last_time
+        current_segment['avg_speed'] = speed_sum / speed_count if speed_count else 0.0
+        segments.append(current_segment)
+
+    return segments
+
+
 def generate_trip_report_data(executor, user_id, start_date, end_date, progress_callback=None):
     """
     Generate trip report data showing vehicle states (parked, idle, run).
@@ -515,19 +959,22 @@ def generate_trip_report_data(executor, user_id, start_date, end_date, progress_
     # Speed threshold for determining run vs idle (km/h)
     SPEED_THRESHOLD = 2.0
 
+    # Query bounds for the report period
+    period = (f'{start_date} 00:00:00', f'{end_date} 23:59:59')
+
     # Load geofences for this user
     geofences = load_geofences_for_user(executor, user_id)
 
     # Get all devices for this user
-    devices_query = f"""
+    devices_query = """
         SELECT d.id, d.name, d.imei, dg.title as group_name
         FROM devices d
         JOIN user_device_pivot udp ON d.id = udp.device_id
         LEFT JOIN device_groups dg ON udp.group_id = dg.id
-        WHERE udp.user_id = {user_id} AND d.deleted = 0
+        WHERE udp.user_id = %s AND d.deleted = 0
         ORDER BY d.name
     """
-    devices = executor.fetchall(devices_query)
+    devices = executor.fetchall(devices_query, (user_id,))
 
     if not devices:
         return [], {}
@@ -543,17 +990,19 @@ def generate_trip_report_data(executor, user_id, start_date, end_date, progress_
         'total_distance': 0.0
     }
 
+    # Query positions from the device-specific tables in gpswox_traccar, one mysql call
+    # per batch of devices, and fold each device's rows into segments as they stream in.
+    # Each device gets its own statement ordered by time (read off the time index of its
+    # table), so the results come back one device after another without MySQL sorting
+    # the whole batch before the first row is sent.
+    device_ids = fetch_position_table_ids(executor, [int(device[0]) for device in devices])
     total_devices = len(devices)
-    for idx, device in enumerate(devices):
-        # Report progress
-        if progress_callback:
-            progress_callback(idx / total_devices)
-        device_id, device_name, imei, group_name = device
+    segments_by_device = {}
 
-        # Query positions from device-specific table in gpswox_traccar
-        # Switch to traccar database for position query
-        positions_query = f"""
+    def fetch_segments(batch):
+        positions_query = ";\n".join(f"""
             SELECT
+                {device_id} as device_id,
                 time,
                 speed,
                 latitude,
@@ -561,107 +1010,24 @@ def generate_trip_report_data(executor, user_id, start_date, end_date, progress_
                 distance,
                 EXTRACTVALUE(other, '//ignition') as ignition
             FROM gpswox_traccar.positions_{device_id}
-            WHERE time BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'
-            ORDER BY time ASC
-        """
-
-        try:
-            positions = executor.fetchall(positions_query)
-        except Exception as e:
-            # Table might not exist for this device
-            continue
-
-        if not positions:
-            continue
-
-        # Process positions into trip segments
-        segments = []
-        current_segment = None
-        segment_positions = []
-
-        for pos in positions:
-            pos_time, speed, lat, lng, distance, ignition = pos
-
-            # Parse values
-            try:
-                speed = float(speed) if speed else 0.0
-                distance = float(distance) if distance else 0.0
-                lat = float(lat) if lat else 0.0
-                lng = float(lng) if lng else 0.0
-            except (ValueError, TypeError):
-                speed = 0.0
-                distance = 0.0
-                lat = 0.0
-                lng = 0.0
-
-            # Determine state based on ignition and speed
-            ignition_on = str(ignition).lower() == 'true'
-
-            if not ignition_on:
-                state = 'parked'
-            elif speed > SPEED_THRESHOLD:
-                state = 'run'
-            else:
-                state = 'idle'
-
-            # Create or extend segment
-            if current_segment is None:
-                # Look up geofence for this location
-                geofence_name = find_geofence_for_point(lat, lng, geofences) if lat and lng else None
-
-                current_segment = {
-                    'start_time': pos_time,
-                    'state': state,
-                    'start_lat': lat,
-                    'start_lng': lng,
-                    'geofence': geofence_name,
-                    'distance': 0.0,
-                    'speeds': []
-                }
-                segment_positions = [(pos_time, speed, distance)]
-            elif current_segment['state'] == state:
-                # Continue same segment
-                segment_positions.append((pos_time, speed, distance))
-                if state == 'run':
-                    current_segment['distance'] += distance
-                    current_segment['speeds'].append(speed)
-            else:
-                # State changed - close current segment and start new one
-                last_time = segment_positions[-1][0] if segment_positions else pos_time
-                current_segment['stop_time'] = last_time
-
-                # Calculate average speed for run segments
-                if current_segment['state'] == 'run' and current_segment['speeds']:
-                    current_segment['avg_speed'] = sum(current_segment['speeds']) / len(current_segment['speeds'])
-                else:
-                    current_segment['avg_speed'] = 0.0
-
-                segments.append(current_segment)
-
-                # Look up geofence for new segment location
-                geofence_name = find_geofence_for_point(lat, lng, geofences) if lat and lng else None
-
-                # Start new segment
-                current_segment = {
-                    'start_time': pos_time,
-                    'state': state,
-                    'start_lat': lat,
-                    'start_lng': lng,
-                    'geofence': geofence_name,
-                    'distance': 0.0,
-                    'speeds': []
-                }
-                segment_positions = [(pos_time, speed, distance)]
+            WHERE time BETWEEN %s AND %s
+            ORDER BY time ASC""" for device_id in batch)
+
+        rows = executor.iterrows(positions_query, period * len(batch))
+        for device_id, device_rows in groupby(rows, key=itemgetter(0)):
+            # A device is stored only once all its rows have been read
+            segments_by_device[int(device_id)] = build_trip_segments(
+                (row[1:] for row in device_rows), geofences, SPEED_THRESHOLD
+            )
+            # Report progress
+            if progress_callback:
+                progress_callback(len(segments_by_device) / total_devices)
 
-        # Close last segment
-        if current_segment and segment_positions:
-            current_segment['stop_time'] = segment_positions[-1][0]
-            if current_segment['state'] == 'run' and current_segment['speeds']:
-                current_segment['avg_speed'] = sum(current_segment['speeds']) / len(current_segment['speeds'])
-            else:
-                current_segment['avg_speed'] = 0.0
-            segments.append(current_segment)
+    fetch_position_batches(device_ids, fetch_segments, segments_by_device, "fetch positions")
 
+    for device in devices:
+        device_id, device_name, imei, group_name = device
+        segments = segments_by_device.get(int(device_id))
         if not segments:
             continue
 
@@ -727,6 +1093,45 @@ def format_duration(seconds):
         return f"{hours}:{minutes:02d}:{secs:02d}"
 
 
+def format_durations(seconds):
+    """
+    format_duration() for a whole sequence of seconds at once. The D/H/M/S split is
+    done with numpy integer division and the strings are built with one bulk %
+    operation per layout, rather than with one call per value.
+    """
+    secs = np.asarray(seconds, dtype=np.float64)
+    secs[~(secs > 0)] = 0  # None/NaN/negative durations format as 0:00:00
+    total = secs.astype(np.int64)
+    days, rem = np.divmod(total, 86400)
+    hours, rem = np.divmod(rem, 3600)
+    minutes, secs = np.divmod(rem, 60)
+
+    formatted = np.empty(len(total), dtype=object)
+    short = days == 0
+    for mask, fields, fmt in ((short, (hours, minutes, secs), '%d:%02d:%02d\n'),
+                              (~short, (days, hours, minutes, secs), '%d:%02d:%02d:%02d\n')):
+        count = int(np.count_nonzero(mask))
+        if count:
+            values = np.stack([field[mask] for field in fields], axis=1).ravel().tolist()
+            formatted[mask] = ((fmt * count) % tuple(values)).split('\n')[:-1]
+    return formatted.tolist()
+
+
+def format_timestamp(value, default=''):
+    """
+    Format a timestamp as 'YYYY-MM-DD HH:MM:SS' (no fractional seconds/timezone).
+    Strings from the mysql client are sliced as-is, datetimes go through strftime;
+    falsy values return default.
+    """
+    if not value:
+        return default
+    if value.__class__ is str:
+        return value[:19]
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)[:19]
+
+
 def format_hours(seconds):
     """Format seconds into decimal hours (e.g., 11.848333)."""
     if not seconds or seconds < 0:
@@ -734,6 +1139,44 @@ def format_hours(seconds):
     return round(seconds / 3600, 6)
 
 
+def append_fleet_vehicle(all_vehicle_data, global_stats, device, device_events,
+                         start_time=None, stop_time=None, driver_timesheet=0,
+                         total_idle_time=0, total_trip_time=0, total_trip_distance=0,
+                         start_odometer=None, end_odometer=None):
+    """
+    Append one vehicle row to the fleet summary and add its event counts to the totals.
+
+    Defaults describe a vehicle with no positions in the report period.
+    """
+    device_id, device_name, imei, group_name = device
+    all_vehicle_data.append({
+        'device_id': device_id,
+        'device_name': device_name,
+        'imei': imei,
+        'group': group_name,
+        'start_time': start_time,
+        'stop_time': stop_time,
+        'driver_timesheet': driver_timesheet,
+        'total_idle_time': total_idle_time,
+        'total_trip_time': total_trip_time,
+        'total_trip_distance': total_trip_distance,
+        'start_odometer': start_odometer,
+        'end_odometer': end_odometer,
+        'h_acceleration': device_events['h_accel'],
+        'h_brake': device_events['h_brake'],
+        'seatbelt': device_events['seatbelt'],
+        'sos': device_events['sos']
+    })
+
+    # Update global stats (event totals are unchanged by a vehicle with no events)
+    global_stats['total_vehicles'] += 1
+    if device_events is not ZERO_EVENTS:
+        global_stats['total_seatbelt'] += device_events['seatbelt']
+        global_stats['total_sos'] += device_events['sos']
+        global_stats['total_h_brake'] += device_events['h_brake']
+        global_stats['total_h_accel'] += device_events['h_accel']
+
+
 def generate_fleet_summary_data(executor, user_id, start_date, end_date, progress_callback=None):
     """
     Generate fleet summary report data matching the reference Excel format.
@@ -758,16 +1201,19 @@ def generate_fleet_summary_data(executor, user_id, start_date, end_date, progres
     # Speed threshold for determining moving vs idle (km/h)
     SPEED_THRESHOLD = 2.0
 
+    # Query bounds for the report period
+    period = (f'{start_date} 00:00:00', f'{end_date} 23:59:59')
+
     # Get all devices for this user
-    devices_query = f"""
+    devices_query = """
         SELECT d.id, d.name, d.imei, dg.title as group_name
         FROM devices d
         JOIN user_device_pivot udp ON d.id = udp.device_id
         LEFT JOIN device_groups dg ON udp.group_id = dg.id
-        WHERE udp.user_id = {user_id} AND d.deleted = 0
+        WHERE udp.user_id = %s AND d.deleted = 0
         ORDER BY d.name
     """
-    devices = executor.fetchall(devices_query)
+    devices = executor.fetchall(devices_query, (user_id,))
 
     if not devices:
         return [], {}
@@ -775,7 +1221,7 @@ def generate_fleet_summary_data(executor, user_id, start_date, end_date, progres
     # Get event counts for all devices in one query
     # Note: Removed type='custom' filter - events may have different types (alarm, driver, etc.)
     # Using message patterns to identify event types instead
-    events_query = f"""
+    events_query = """
         SELECT
             e.device_id,
             SUM(CASE WHEN UPPER(e.message) LIKE '%ACCELERATION%' OR UPPER(e.message) LIKE '%ACCEL%' THEN 1 ELSE 0 END) as h_accel,
@@ -784,13 +1230,13 @@ def generate_fleet_summary_data(executor, user_id, start_date, end_date, progres
             SUM(CASE WHEN UPPER(e.message) = 'SOS' OR UPPER(e.message) LIKE '%SOS%' THEN 1 ELSE 0 END) as sos
         FROM events e
         JOIN devices d ON e.device_id = d.id
-        JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = {user_id}
-        WHERE e.created_at BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'
+        JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = %s
+        WHERE e.created_at BETWEEN %s AND %s
         AND e.deleted = 0
         GROUP BY e.device_id
     """
     try:
-        event_rows = executor.fetchall(events_query)
+        event_rows = executor.fetchall(events_query, (user_id,) + period)
         events_by_device = {int(r[0]): {'h_accel': int(r[1] or 0), 'h_brake': int(r[2] or 0),
                                          'seatbelt': int(r[3] or 0), 'sos': int(r[4] or 0)}
                            for r in event_rows}
@@ -809,173 +1255,103 @@ def generate_fleet_summary_data(executor, user_id, start_date, end_date, progres
         'total_h_accel': 0
     }
 
+    # Aggregate positions from the device-specific tables in a single pass on the DB side,
+    # one UNION ALL query (one row per device) per batch of devices.
+    # Mirrors the per-position rules: time delta since the previous position counts
+    # as trip/idle when the previous position had ignition on (split by current speed),
+    # and distance counts towards the trip distance whenever speed is above threshold.
+    # historical_distance is the cumulative distance before the period (start odometer).
+    device_ids = fetch_position_table_ids(executor, [int(device[0]) for device in devices])
     total_devices = len(devices)
-    for idx, device in enumerate(devices):
+    aggregates_by_device = {}
+
+    def fetch_aggregates(batch):
+        positions_query = " UNION ALL ".join(f"""
+            (SELECT
+                {device_id} as device_id,
+                COUNT(*) as position_count,
+                MIN(CASE WHEN ignition_on THEN time END) as start_time,
+                MAX(CASE WHEN ignition_on THEN time END) as stop_time,
+                COALESCE(SUM(CASE WHEN prev_ignition_on AND speed > {SPEED_THRESHOLD}
+                                  THEN TIMESTAMPDIFF(SECOND, prev_time, time) END), 0) as trip_seconds,
+                COALESCE(SUM(CASE WHEN prev_ignition_on AND speed <= {SPEED_THRESHOLD}
+                                  THEN TIMESTAMPDIFF(SECOND, prev_time, time) END), 0) as idle_seconds,
+                COALESCE(SUM(CASE WHEN speed > {SPEED_THRESHOLD} THEN distance END), 0) as trip_distance,
+                COALESCE(SUM(distance), 0) as cumulative_distance,
+                (SELECT COALESCE(SUM(distance), 0)
+                 FROM gpswox_traccar.positions_{device_id}
+                 WHERE time < %s) as historical_distance
+            FROM (
+                SELECT
+                    time,
+                    speed,
+                    distance,
+                    ignition_on,
+                    LAG(time) OVER w as prev_time,
+                    LAG(ignition_on) OVER w as prev_ignition_on
+                FROM (
+                    SELECT
+                        time,
+                        COALESCE(speed, 0) as speed,
+                        COALESCE(distance, 0) as distance,
+                        EXTRACTVALUE(other, '//ignition') IN ('true', '1') as ignition_on
+                    FROM gpswox_traccar.positions_{device_id}
+                    WHERE time BETWEEN %s AND %s
+                ) p
+                WINDOW w AS (ORDER BY time)
+            ) s)""" for device_id in batch)
+
+        # Each device part takes (period start, period start, period end)
+        rows = executor.fetchall(positions_query, ((period[0],) + period) * len(batch))
+        aggregates_by_device.update((int(row[0]), row[1:]) for row in rows)
+
         # Report progress
         if progress_callback:
-            progress_callback(idx / total_devices)
+            progress_callback(len(aggregates_by_device) / total_devices)
 
-        device_id, device_name, imei, group_name = device
+    fetch_position_batches(device_ids, fetch_aggregates, aggregates_by_device, "aggregate positions")
 
-        # Query historical cumulative distance (start odometer)
-        historical_dist_query = f"""
-            SELECT COALESCE(SUM(distance), 0) as total_dist
-            FROM gpswox_traccar.positions_{device_id}
-            WHERE time < '{start_date} 00:00:00'
-        """
-
-        try:
-            hist_result = executor.fetchone(historical_dist_query)
-            historical_distance = float(hist_result[0]) if hist_result and hist_result[0] else 0
-        except Exception:
-            historical_distance = 0
-
-        # Query positions from device-specific table
-        positions_query = f"""
-            SELECT
-                time,
-                speed,
-                distance,
-                EXTRACTVALUE(other, '//ignition') as ignition
-            FROM gpswox_traccar.positions_{device_id}
-            WHERE time BETWEEN '{start_date} 00:00:00' AND '{end_date} 23:59:59'
-            ORDER BY time ASC
-        """
+    for device in devices:
+        device_id, device_name, imei, group_name = device
 
-        try:
-            positions = executor.fetchall(positions_query)
-        except Exception:
-            # Table might not exist for this device
+        aggregate = aggregates_by_device.get(int(device_id))
+        if aggregate is None:
+            # No positions table for this device (or its query failed)
             continue
 
-        if not positions:
+        # Get event counts for this device (convert device_id to int for lookup)
+        device_events = events_by_device.get(int(device_id), ZERO_EVENTS)
+
+        if not int(aggregate[0] or 0):
             # Device had no data for this period - include with zeros
-            device_events = events_by_device.get(device_id, {'h_accel': 0, 'h_brake': 0, 'seatbelt': 0, 'sos': 0})
-            all_vehicle_data.append({
-                'device_id': device_id,
-                'device_name': device_name,
-                'imei': imei,
-                'group': group_name,
-                'start_time': None,
-                'stop_time': None,
-                'driver_timesheet': 0,
-                'total_idle_time': 0,
-                'total_trip_time': 0,
-                'total_trip_distance': 0,
-                'start_odometer': None,
-                'end_odometer': None,
-                'h_acceleration': device_events['h_accel'],
-                'h_brake': device_events['h_brake'],
-                'seatbelt': device_events['seatbelt'],
-                'sos': device_events['sos']
-            })
-            global_stats['total_vehicles'] += 1
-            global_stats['total_seatbelt'] += device_events['seatbelt']
-            global_stats['total_sos'] += device_events['sos']
-            global_stats['total_h_brake'] += device_events['h_brake']
-            global_stats['total_h_accel'] += device_events['h_accel']
+            append_fleet_vehicle(all_vehicle_data, global_stats, device, device_events)
             continue
 
-        # Process positions
-        start_time = None
-        stop_time = None
-        total_idle_seconds = 0
-        total_trip_seconds = 0
-        total_distance = 0
-        cumulative_distance = 0  # Running total for today's distance
-        start_odometer = historical_distance  # Start odometer is cumulative before today
-        end_odometer = historical_distance  # Will be updated as we process positions
-
-        prev_time = None
-        prev_ignition = None
-
-        for pos in positions:
-            pos_time, speed, distance, ignition = pos
-
-            # Parse values
-            try:
-                speed = float(speed) if speed else 0.0
-                distance = float(distance) if distance else 0.0
-            except (ValueError, TypeError):
-                speed = 0.0
-                distance = 0.0
-
-            ignition_on = str(ignition).lower() == 'true'
-
-            # Track cumulative distance for odometer
-            cumulative_distance += distance
-
-            # Update end odometer (historical + today's cumulative)
-            end_odometer = historical_distance + cumulative_distance
-
-            # Track first and last ignition-on times
-            if ignition_on:
-                if start_time is None:
-                    start_time = pos_time
-                stop_time = pos_time
-
-            # Calculate time deltas if we have a previous position
-            if prev_time is not None:
-                try:
-                    curr_dt = datetime.strptime(str(pos_time)[:19], '%Y-%m-%d %H:%M:%S')
-                    prev_dt = datetime.strptime(str(prev_time)[:19], '%Y-%m-%d %H:%M:%S')
-                    delta_seconds = (curr_dt - prev_dt).total_seconds()
-
-                    # Only count time when ignition was on
-                    if prev_ignition:
-                        if speed > SPEED_THRESHOLD:
-                            total_trip_seconds += delta_seconds
-                        else:
-                            total_idle_seconds += delta_seconds
-                except (ValueError, TypeError):
-                    pass
-
-            # Add distance when moving
-            if speed > SPEED_THRESHOLD:
-                total_distance += distance
-
-            prev_time = pos_time
-            prev_ignition = ignition_on
+        (_, start_time, stop_time, trip_seconds, idle_seconds, trip_distance,
+         cumulative_distance, historical_distance) = aggregate
+        historical_distance = float(historical_distance or 0)
 
         # Calculate driver timesheet (total time from first to last position with ignition)
-        driver_timesheet_seconds = 0
-        if start_time and stop_time:
-            try:
-                start_dt = datetime.strptime(str(start_time)[:19], '%Y-%m-%d %H:%M:%S')
-                stop_dt = datetime.strptime(str(stop_time)[:19], '%Y-%m-%d %H:%M:%S')
-                driver_timesheet_seconds = (stop_dt - start_dt).total_seconds()
-            except (ValueError, TypeError):
-                pass
-
-        # Get event counts for this device (convert device_id to int for lookup)
-        device_events = events_by_device.get(int(device_id), {'h_accel': 0, 'h_brake': 0, 'seatbelt': 0, 'sos': 0})
-
-        # Add to results
-        all_vehicle_data.append({
-            'device_id': device_id,
-            'device_name': device_name,
-            'imei': imei,
-            'group': group_name,
-            'start_time': start_time,
-            'stop_time': stop_time,
-            'driver_timesheet': driver_timesheet_seconds,
-            'total_idle_time': total_idle_seconds,
-            'total_trip_time': total_trip_seconds,
-            'total_trip_distance': total_distance,
-            'start_odometer': start_odometer,
-            'end_odometer': end_odometer,
-            'h_acceleration': device_events['h_accel'],
-            'h_brake': device_events['h_brake'],
-            'seatbelt': device_events['seatbelt'],
-            'sos': device_events['sos']
-        })
+        driver_timesheet_seconds = 0
+        if start_time and stop_time:
+            try:
+                start_dt = datetime.strptime(str(start_time)[:19], '%Y-%m-%d %H:%M:%S')
+                stop_dt = datetime.strptime(str(stop_time)[:19], '%Y-%m-%d %H:%M:%S')
+                driver_timesheet_seconds = (stop_dt - start_dt).total_seconds()
+            except (ValueError, TypeError):
+                pass
 
-        # Update global stats
-        global_stats['total_vehicles'] += 1
-        global_stats['total_seatbelt'] += device_events['seatbelt']
-        global_stats['total_sos'] += device_events['sos']
-        global_stats['total_h_brake'] += device_events['h_brake']
-        global_stats['total_h_accel'] += device_events['h_accel']
+        append_fleet_vehicle(
+            all_vehicle_data, global_stats, device, device_events,
+            start_time=start_time,
+            stop_time=stop_time,
+            driver_timesheet=driver_timesheet_seconds,
+            total_idle_time=float(idle_seconds or 0),
+            total_trip_time=float(trip_seconds or 0),
+            total_trip_distance=float(trip_distance or 0),
+            start_odometer=historical_distance,  # Start odometer is cumulative before today
+            end_odometer=historical_distance + float(cumulative_distance or 0),
+        )
 
     return all_vehicle_data, global_stats
 
@@ -1017,21 +1393,29 @@ def export_fleet_summary_to_excel(vehicle_data, global_stats, start_date, end_da
         'Start Odomenter', 'End Odometer', 'H-Acceleration', 'H-Brake', 'SeatBelt', 'SOS'
     ])
 
-    # Data rows
+    # Data rows (bind loop-invariant lookups to locals for the per-vehicle loop)
+    fmt_hours, rnd, append_row = format_hours, round, ws.append
     for vehicle in vehicle_data:
-        start_time = str(vehicle['start_time'])[:19] if vehicle.get('start_time') else None
-        stop_time = str(vehicle['stop_time'])[:19] if vehicle.get('stop_time') else None
-
-        ws.append([
+        # Read each field once instead of a .get() check followed by a second lookup
+        start_time = vehicle.get('start_time')
+        stop_time = vehicle.get('stop_time')
+        timesheet = vehicle['driver_timesheet']
+        idle_time = vehicle['total_idle_time']
+        trip_time = vehicle['total_trip_time']
+        trip_distance = vehicle['total_trip_distance']
+        start_odometer = vehicle.get('start_odometer')
+        end_odometer = vehicle.get('end_odometer')
+
+        append_row([
             vehicle['device_name'],
-            start_time,
-            stop_time,
-            format_hours(vehicle['driver_timesheet']) if vehicle['driver_timesheet'] else None,
-            format_hours(vehicle['total_idle_time']) if vehicle['total_idle_time'] else 0,
-            format_hours(vehicle['total_trip_time']) if vehicle['total_trip_time'] else 0,
-            round(vehicle['total_trip_distance'], 6) if vehicle['total_trip_distance'] else 0,
-            round(vehicle['start_odometer'], 6) if vehicle.get('start_odometer') else None,
-            round(vehicle['end_odometer'], 6) if vehicle.get('end_odometer') else None,
+            format_timestamp(start_time, None),
+            format_timestamp(stop_time, None),
+            fmt_hours(timesheet) if timesheet else None,
+            fmt_hours(idle_time) if idle_time else 0,
+            fmt_hours(trip_time) if trip_time else 0,
+            rnd(trip_distance, 6) if trip_distance else 0,
+            rnd(start_odometer, 6) if start_odometer else None,
+            rnd(end_odometer, 6) if end_odometer else None,
             vehicle['h_acceleration'],
             vehicle['h_brake'],
             vehicle['seatbelt'],
@@ -1071,26 +1455,38 @@ def export_fleet_summary_to_csv(vehicle_data, global_stats, start_date, end_date
         'Start Odomenter', 'End Odometer', 'H-Acceleration', 'H-Brake', 'SeatBelt', 'SOS'
     ])
 
-    # Data rows
-    for vehicle in vehicle_data:
-        start_time = str(vehicle['start_time'])[:19] if vehicle.get('start_time') else ''
-        stop_time = str(vehicle['stop_time'])[:19] if vehicle.get('stop_time') else ''
+    # Data rows, generated lazily and written in one writerows() batch
+    def data_rows():
+        # Bind loop-invariant lookups to locals for the per-vehicle loop
+        fmt_hours, rnd = format_hours, round
+        for vehicle in vehicle_data:
+            # Read each field once instead of a .get() check followed by a second lookup
+            start_time = vehicle.get('start_time')
+            stop_time = vehicle.get('stop_time')
+            timesheet = vehicle['driver_timesheet']
+            idle_time = vehicle['total_idle_time']
+            trip_time = vehicle['total_trip_time']
+            trip_distance = vehicle['total_trip_distance']
+            start_odometer = vehicle.get('start_odometer')
+            end_odometer = vehicle.get('end_odometer')
+
+            yield (
+                vehicle['device_name'],
+                format_timestamp(start_time),
+                format_timestamp(stop_time),
+                fmt_hours(timesheet) if timesheet else '',
+                fmt_hours(idle_time) if idle_time else 0,
+                fmt_hours(trip_time) if trip_time else 0,
+                rnd(trip_distance, 6) if trip_distance else 0,
+                rnd(start_odometer, 6) if start_odometer else '',
+                rnd(end_odometer, 6) if end_odometer else '',
+                vehicle['h_acceleration'],
+                vehicle['h_brake'],
+                vehicle['seatbelt'],
+                vehicle['sos']
+            )
 
-        writer.writerow([
-            vehicle['device_name'],
-            start_time,
-            stop_time,
-            format_hours(vehicle['driver_timesheet']) if vehicle['driver_timesheet'] else '',
-            format_hours(vehicle['total_idle_time']) if vehicle['total_idle_time'] else 0,
-            format_hours(vehicle['total_trip_time']) if vehicle['total_trip_time'] else 0,
-            round(vehicle['total_trip_distance'], 6) if vehicle['total_trip_distance'] else 0,
-            round(vehicle['start_odometer'], 6) if vehicle.get('start_odometer') else '',
-            round(vehicle['end_odometer'], 6) if vehicle.get('end_odometer') else '',
-            vehicle['h_acceleration'],
-            vehicle['h_brake'],
-            vehicle['seatbelt'],
-            vehicle['sos']
-        ])
+    writer.writerows(data_rows())
 
     output.seek(0)
     return output.getvalue()
@@ -1117,6 +1513,11 @@ def export_trip_report_to_excel(trip_data, global_stats, start_date, end_date):
     ws.append(['* Trip = Time that a vehicle is online and moving.'])
     ws.append(['* Parked = Time a vehicle is online and while standing with ignition signal off'])
 
+    # Segment durations for all vehicles, formatted in one pass (consumed in order below)
+    durations = iter(format_durations(
+        [seg.get('duration_seconds', 0) for vehicle in trip_data for seg in vehicle['segments']]
+    ))
+
     # Per-vehicle sections
     for vehicle in trip_data:
         ws.append([])
@@ -1132,9 +1533,9 @@ def export_trip_report_to_excel(trip_data, global_stats, start_date, end_date):
         vehicle_total_speed_sum = 0
 
         for seg in vehicle['segments']:
-            start_time = str(seg['start_time'])[:19] if seg.get('start_time') else ''
-            stop_time = str(seg['stop_time'])[:19] if seg.get('stop_time') else ''
-            duration = format_duration(seg.get('duration_seconds', 0))
+            start_time = format_timestamp(seg.get('start_time'))
+            stop_time = format_timestamp(seg.get('stop_time'))
+            duration = next(durations)
 
             # Use geofence name if available, otherwise use coordinates
             geofence_name = seg.get('geofence')
@@ -1192,19 +1593,18 @@ def export_trip_report_to_csv(trip_data, global_stats, start_date, end_date):
     writer.writerow(['Total distance:', round(global_stats['total_distance'], 6)])
     writer.writerow([])
 
-    # Per-vehicle sections
-    for vehicle in trip_data:
-        writer.writerow([])
-        writer.writerow([f"Info : {vehicle['device_name']}"])
-        writer.writerow(['Total duration trip:', format_duration(vehicle['stats']['total_trip'])])
-        writer.writerow(['Total duration idle:', format_duration(vehicle['stats']['total_idle'])])
-        writer.writerow(['Total distance:', round(vehicle['stats']['total_distance'], 6)])
-        writer.writerow(['Start Time', 'Stop Time', 'Duration', 'Address', 'Distance', 'Avg Speed', 'Trip State', 'Vehicle Name'])
+    # Segment durations for all vehicles, formatted in one pass (consumed in order below)
+    durations = iter(format_durations(
+        [seg.get('duration_seconds', 0) for vehicle in trip_data for seg in vehicle['segments']]
+    ))
 
+    # Segment rows for one vehicle, generated lazily for a single writerows() call
+    def segment_rows(vehicle):
+        device_name = vehicle['device_name']
         for seg in vehicle['segments']:
-            start_time = str(seg['start_time'])[:19] if seg.get('start_time') else ''
-            stop_time = str(seg['stop_time'])[:19] if seg.get('stop_time') else ''
-            duration = format_duration(seg.get('duration_seconds', 0))
+            start_time = format_timestamp(seg.get('start_time'))
+            stop_time = format_timestamp(seg.get('stop_time'))
+            duration = next(durations)
 
             # Use geofence name if available, otherwise use coordinates
             geofence_name = seg.get('geofence')
@@ -1222,36 +1622,39 @@ def export_trip_report_to_csv(trip_data, global_stats, start_date, end_date):
             if state == 'run':
                 distance = round(seg.get('distance', 0), 6)
                 avg_speed = round(seg.get('avg_speed', 0), 6)
-                vehicle_name = vehicle['device_name']
+                vehicle_name = device_name
             else:
                 distance = ''
                 avg_speed = ''
                 vehicle_name = ''
 
-            writer.writerow([start_time, stop_time, duration, address, distance, avg_speed, state, vehicle_name])
-
-    output.seek(0)
-    return output.getvalue()
+            yield (start_time, stop_time, duration, address, distance, avg_speed, state, vehicle_name)
 
+    # Per-vehicle sections
+    for vehicle in trip_data:
+        writer.writerow([])
+        writer.writerow([f"Info : {vehicle['device_name']}"])
+        writer.writerow(['Total duration trip:', format_duration(vehicle['stats']['total_trip'])])
+        writer.writerow(['Total duration idle:', format_duration(vehicle['stats']['total_idle'])])
+        writer.writerow(['Total distance:', round(vehicle['stats']['total_distance'], 6)])
+        writer.writerow(['Start Time', 'Stop Time', 'Duration', 'Address', 'Distance', 'Avg Speed', 'Trip State', 'Vehicle Name'])
 
-def generate_report_data(executor, project_email, report_id, start_date, end_date):
-    """Generate report data based on report type."""
-    user = get_user_by_email(executor, project_email)
-    if not user:
-        return [], []
+        writer.writerows(segment_rows(vehicle))
 
-    user_id = user['id']
+    output.seek(0)
+    return output.getvalue()
 
-    # Get report info
-    reports = REPORTS.get(project_email, [])
-    report_info = next((r for r in reports if r['id'] == report_id), None)
-    if not report_info:
-        return [], []
 
-    report_name = report_info['name'].lower()
+@lru_cache(maxsize=None)
+def build_report_query(report_name):
+    """
+    Build the SQL template for a standard report from its (lower-cased) name.
 
-    # Initialize geofence resolution flags
-    needs_geofence = False
+    Returns (columns, query, param_names, location_col_indices). The template only
+    depends on the report name, so it is built once per name; generate_report_data()
+    fills in the %s params listed in param_names.
+    """
+    # Set for reports whose lat/lng columns get resolved to a geofence name
     location_col_indices = None
 
     # Define queries based on report type
@@ -1260,15 +1663,16 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
 
     if 'device' in report_name or 'imei' in report_name or 'current' in report_name:
         columns = ['ID', 'Device Name', 'IMEI', 'Last Update', 'Speed', 'Latitude', 'Longitude', 'Address']
-        query = f"""
+        query = """
             SELECT d.id, d.name, d.imei, t.updated_at,
                    t.speed, t.lastValidLatitude, t.lastValidLongitude, t.address
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            LEFT JOIN traccar_devices t ON d.imei COLLATE utf8_general_ci = t.uniqueId COLLATE utf8_general_ci
-            WHERE udp.user_id = {user_id} AND d.deleted = 0
+            LEFT JOIN traccar_devices t ON t.uniqueId = d.imei COLLATE utf8_general_ci
+            WHERE udp.user_id = %s AND d.deleted = 0
             ORDER BY d.name
         """
+        param_names = ('user_id',)
     elif 'overspeeding' in report_name or 'speed' in report_name:
         # Determine vehicle category filter based on report name
         group_filter = ""
@@ -1285,44 +1689,45 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                    e.latitude, e.longitude
             FROM events e
             JOIN devices d ON e.device_id = d.id
-            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = {user_id}
+            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = %s
             LEFT JOIN device_groups dg ON udp.group_id = dg.id
-            WHERE (e.type LIKE '%speed%' OR e.type LIKE '%overspeed%')
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            WHERE (e.type LIKE %s OR e.type LIKE '%overspeed%')
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             {group_filter}
             ORDER BY e.created_at DESC
         """
-        # Flag to indicate this report needs geofence resolution
-        needs_geofence = True
+        param_names = ('user_id', 'speed_pattern', 'period_start', 'period_end')
+        # This report needs geofence resolution
         location_col_indices = (7, 8)  # latitude at index 7, longitude at index 8
     elif 'trip' in report_name or 'idle' in report_name:
         columns = ['ID', 'Device Name', 'IMEI', 'Trip Date', 'Last Update']
-        query = f"""
+        query = """
             SELECT dt.id, d.name, d.imei, dt.date, d.updated_at
             FROM device_trips dt
             JOIN devices d ON dt.device_id = d.id
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            WHERE udp.user_id = {user_id}
-            AND dt.date BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            WHERE udp.user_id = %s
+            AND dt.date BETWEEN %s AND %s
             AND d.deleted = 0
             ORDER BY dt.date DESC
         """
+        param_names = ('user_id', 'period_start', 'period_end')
     elif 'sos' in report_name:
         columns = ['Event ID', 'Device Name', 'Group', 'Event Time', 'Speed', 'Message', 'Location']
-        query = f"""
+        query = """
             SELECT e.id, d.name, dg.title, e.created_at, e.speed, e.message,
                    e.latitude, e.longitude
             FROM events e
             JOIN devices d ON e.device_id = d.id
-            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = {user_id}
+            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = %s
             LEFT JOIN device_groups dg ON udp.group_id = dg.id
             WHERE (UPPER(e.message) = 'SOS' OR UPPER(e.message) LIKE '%SOS%')
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             ORDER BY e.created_at DESC
         """
-        needs_geofence = True
+        param_names = ('user_id', 'period_start', 'period_end')
         location_col_indices = (6, 7)  # latitude at index 6, longitude at index 7
     elif 'harsh' in report_name or 'acceleration' in report_name or 'braking' in report_name:
         if 'acceleration' in report_name:
@@ -1336,89 +1741,94 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                    e.latitude, e.longitude
             FROM events e
             JOIN devices d ON e.device_id = d.id
-            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = {user_id}
+            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = %s
             LEFT JOIN device_groups dg ON udp.group_id = dg.id
             WHERE {event_filter}
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             ORDER BY e.created_at DESC
         """
-        needs_geofence = True
+        param_names = ('user_id', 'period_start', 'period_end')
         location_col_indices = (6, 7)  # latitude at index 6, longitude at index 7
     elif 'signal' in report_name:
         columns = ['Device ID', 'Device Name', 'IMEI', 'Model', 'Last Update', 'Protocol']
-        query = f"""
+        query = """
             SELECT d.id, d.name, d.imei, d.device_model, t.updated_at, t.protocol
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            LEFT JOIN traccar_devices t ON d.imei COLLATE utf8_general_ci = t.uniqueId COLLATE utf8_general_ci
-            WHERE udp.user_id = {user_id} AND d.deleted = 0
+            LEFT JOIN traccar_devices t ON t.uniqueId = d.imei COLLATE utf8_general_ci
+            WHERE udp.user_id = %s AND d.deleted = 0
             ORDER BY d.name
         """
+        param_names = ('user_id',)
     elif 'distance' in report_name:
         columns = ['Device ID', 'Device Name', 'IMEI', 'Model', 'Plate Number', 'Last Update']
-        query = f"""
+        query = """
             SELECT d.id, d.name, d.imei, d.device_model, d.plate_number, d.updated_at
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            WHERE udp.user_id = {user_id} AND d.deleted = 0
+            WHERE udp.user_id = %s AND d.deleted = 0
             ORDER BY d.name
         """
+        param_names = ('user_id',)
     elif 'event' in report_name:
         columns = ['Event ID', 'Device Name', 'Event Type', 'Event Time', 'Speed', 'Message', 'Location']
-        query = f"""
+        query = """
             SELECT e.id, d.name, e.type, e.created_at, e.speed, e.message,
                    CONCAT(e.latitude, ', ', e.longitude)
             FROM events e
             JOIN devices d ON e.device_id = d.id
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            WHERE udp.user_id = {user_id}
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            WHERE udp.user_id = %s
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             ORDER BY e.created_at DESC
             LIMIT 1000
         """
+        param_names = ('user_id', 'period_start', 'period_end')
     elif 'time' in report_name or 'location' in report_name:
         columns = ['Device Name', 'Geofence', 'Event Type', 'Event Time', 'Location']
-        query = f"""
+        query = """
             SELECT d.name, g.name, e.type, e.created_at,
                    CONCAT(e.latitude, ', ', e.longitude)
             FROM events e
             JOIN devices d ON e.device_id = d.id
             JOIN user_device_pivot udp ON d.id = udp.device_id
             LEFT JOIN geofences g ON e.geofence_id = g.id
-            WHERE udp.user_id = {user_id}
+            WHERE udp.user_id = %s
             AND e.geofence_id IS NOT NULL
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             ORDER BY e.created_at DESC
         """
+        param_names = ('user_id', 'period_start', 'period_end')
     elif 'fleet' in report_name or 'summary' in report_name:
         columns = ['Device Name', 'IMEI', 'Model', 'Plate Number', 'Status', 'Last Update']
-        query = f"""
+        query = """
             SELECT d.name, d.imei, d.device_model, d.plate_number,
                    CASE WHEN d.active = 1 THEN 'Active' ELSE 'Inactive' END,
                    d.updated_at
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            WHERE udp.user_id = {user_id} AND d.deleted = 0
+            WHERE udp.user_id = %s AND d.deleted = 0
             ORDER BY d.name
         """
+        param_names = ('user_id',)
     elif 'seat' in report_name or 'belt' in report_name:
         columns = ['Event ID', 'Device Name', 'Group', 'Event Time', 'Speed', 'Message', 'Location']
-        query = f"""
+        query = """
             SELECT e.id, d.name, dg.title, e.created_at, e.speed, e.message,
                    e.latitude, e.longitude
             FROM events e
             JOIN devices d ON e.device_id = d.id
-            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = {user_id}
+            JOIN user_device_pivot udp ON d.id = udp.device_id AND udp.user_id = %s
             LEFT JOIN device_groups dg ON udp.group_id = dg.id
             WHERE (UPPER(e.message) LIKE '%SEATBELT%' OR UPPER(e.message) LIKE '%SEAT BELT%' OR UPPER(e.message) LIKE '%SEAT%BELT%')
-            AND e.created_at BETWEEN '{start_date}' AND '{end_date} 23:59:59'
+            AND e.created_at BETWEEN %s AND %s
             AND e.deleted = 0
             ORDER BY e.created_at DESC
         """
-        needs_geofence = True
+        param_names = ('user_id', 'period_start', 'period_end')
         location_col_indices = (6, 7)  # latitude at index 6, longitude at index 7
     elif 'vehicle status' in report_name or 'running time' in report_name:
         # Vehicle Status Report with Running Time, Idle Time, Total Duration
@@ -1428,7 +1838,7 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
         # - Total Duration: Time between engine_on_at and engine_off_at
         # - Idle Time: Total Duration - Running Time
         columns = ['Device Name', 'IMEI', 'Group', 'Running Time', 'Idle Time', 'Total Duration']
-        query = f"""
+        query = """
             SELECT
                 d.name,
                 d.imei,
@@ -1439,8 +1849,8 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                     WHEN t.stoped_at IS NULL OR t.stoped_at < t.moved_at THEN
                         -- Still moving: calculate to end of selected date or NOW, whichever is earlier
                         CONCAT(
-                            FLOOR(TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))) / 3600), 'h ',
-                            MOD(FLOOR(TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))) / 60), 60), 'm'
+                            FLOOR(TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), p.period_end)) / 3600), 'h ',
+                            MOD(FLOOR(TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), p.period_end)) / 60), 60), 'm'
                         )
                     ELSE
                         CONCAT(
@@ -1458,7 +1868,7 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                                 TIMESTAMPDIFF(SECOND, t.engine_on_at,
                                     CASE
                                         WHEN t.engine_off_at IS NULL OR t.engine_off_at < t.engine_on_at
-                                        THEN LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))
+                                        THEN LEAST(NOW(), p.period_end)
                                         ELSE t.engine_off_at
                                     END
                                 )
@@ -1467,7 +1877,7 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                                 CASE
                                     WHEN t.moved_at IS NULL THEN 0
                                     WHEN t.stoped_at IS NULL OR t.stoped_at < t.moved_at
-                                    THEN TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59')))
+                                    THEN TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), p.period_end))
                                     ELSE TIMESTAMPDIFF(SECOND, t.moved_at, t.stoped_at)
                                 END
                             ) / 3600), 'h ',
@@ -1475,7 +1885,7 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                                 TIMESTAMPDIFF(SECOND, t.engine_on_at,
                                     CASE
                                         WHEN t.engine_off_at IS NULL OR t.engine_off_at < t.engine_on_at
-                                        THEN LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))
+                                        THEN LEAST(NOW(), p.period_end)
                                         ELSE t.engine_off_at
                                     END
                                 )
@@ -1483,7 +1893,7 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                                 CASE
                                     WHEN t.moved_at IS NULL THEN 0
                                     WHEN t.stoped_at IS NULL OR t.stoped_at < t.moved_at
-                                    THEN TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59')))
+                                    THEN TIMESTAMPDIFF(SECOND, t.moved_at, LEAST(NOW(), p.period_end))
                                     ELSE TIMESTAMPDIFF(SECOND, t.moved_at, t.stoped_at)
                                 END
                             ) / 60), 60), 'm'
@@ -1494,8 +1904,8 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
                     WHEN t.engine_on_at IS NULL THEN '0h 0m'
                     WHEN t.engine_off_at IS NULL OR t.engine_off_at < t.engine_on_at THEN
                         CONCAT(
-                            FLOOR(TIMESTAMPDIFF(SECOND, t.engine_on_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))) / 3600), 'h ',
-                            MOD(FLOOR(TIMESTAMPDIFF(SECOND, t.engine_on_at, LEAST(NOW(), CONCAT('{end_date}', ' 23:59:59'))) / 60), 60), 'm'
+                            FLOOR(TIMESTAMPDIFF(SECOND, t.engine_on_at, LEAST(NOW(), p.period_end)) / 3600), 'h ',
+                            MOD(FLOOR(TIMESTAMPDIFF(SECOND, t.engine_on_at, LEAST(NOW(), p.period_end)) / 60), 60), 'm'
                         )
                     ELSE
                         CONCAT(
@@ -1506,89 +1916,190 @@ def generate_report_data(executor, project_email, report_id, start_date, end_dat
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
             LEFT JOIN device_groups dg ON udp.group_id = dg.id
-            LEFT JOIN traccar_devices t ON d.imei COLLATE utf8_general_ci = t.uniqueId COLLATE utf8_general_ci
-            WHERE udp.user_id = {user_id}
+            LEFT JOIN traccar_devices t ON t.uniqueId = d.imei COLLATE utf8_general_ci
+            CROSS JOIN (SELECT CAST(%s AS DATETIME) AS period_start, CAST(%s AS DATETIME) AS period_end) p
+            WHERE udp.user_id = %s
             AND d.deleted = 0
             AND (
                 -- Filter: device had activity on the selected date
-                DATE(t.engine_on_at) BETWEEN '{start_date}' AND '{end_date}'
-                OR DATE(t.moved_at) BETWEEN '{start_date}' AND '{end_date}'
-                OR DATE(t.updated_at) BETWEEN '{start_date}' AND '{end_date}'
+                t.engine_on_at BETWEEN p.period_start AND p.period_end
+                OR t.moved_at BETWEEN p.period_start AND p.period_end
+                OR t.updated_at BETWEEN p.period_start AND p.period_end
             )
             ORDER BY d.name
         """
+        param_names = ('period_start', 'period_end', 'user_id')
     else:
         # Default: device list
         columns = ['ID', 'Device Name', 'IMEI', 'Model', 'Plate Number', 'Last Update']
-        query = f"""
+        query = """
             SELECT d.id, d.name, d.imei, d.device_model, d.plate_number, d.updated_at
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
-            WHERE udp.user_id = {user_id} AND d.deleted = 0
+            WHERE udp.user_id = %s AND d.deleted = 0
             ORDER BY d.name
         """
+        param_names = ('user_id',)
 
-    try:
-        rows = executor.fetchall(query)
+    return tuple(columns), query, param_names, location_col_indices
 
-        # Post-process rows to resolve geofences if needed
-        if needs_geofence and location_col_indices and rows:
-            lat_idx, lng_idx = location_col_indices
-            geofences = load_geofences_for_user(executor, user_id)
 
-            processed_rows = []
-            for row in rows:
-                row_list = list(row)
-                lat = row_list[lat_idx]
-                lng = row_list[lng_idx]
+def resolve_row_locations(rows, lat_idx, lng_idx, geofences):
+    """
+    Replace the lat/lng columns of each row with a single location column:
+    the containing geofence name, else the formatted coordinates.
+    """
+    # Parse coordinates first so geofences can be resolved for all rows at once
+    locations = [''] * len(rows)
+    point_rows, lats, lngs = [], [], []
+    for i, row in enumerate(rows):
+        lat = row[lat_idx]
+        lng = row[lng_idx]
+        if lat and lng:
+            try:
+                lat_f = float(lat)
+                lng_f = float(lng)
+            except (ValueError, TypeError):
+                locations[i] = f"{lat}, {lng}"
+                continue
+            point_rows.append(i)
+            lats.append(lat_f)
+            lngs.append(lng_f)
+
+    if point_rows:
+        geofence_names = find_geofences_for_points(np.array(lats), np.array(lngs), geofences)
+        misses = []
+        for k, (i, geofence_name) in enumerate(zip(point_rows, geofence_names)):
+            if geofence_name:
+                locations[i] = geofence_name
+            else:
+                misses.append(k)
 
-                # Try to resolve geofence
-                location = ''
-                if lat and lng:
-                    try:
-                        lat_f = float(lat)
-                        lng_f = float(lng)
-                        geofence_name = find_geofence_for_point(lat_f, lng_f, geofences)
-                        if geofence_name:
-                            location = geofence_name
-                        else:
-                            location = f"{lat_f:.5f}, {lng_f:.5f}"
-                    except (ValueError, TypeError):
-                        location = f"{lat}, {lng}"
-
-                # Replace the two lat/lng columns with single location column
-                row_list = row_list[:lat_idx] + [location]
-                processed_rows.append(tuple(row_list))
-
-            return columns, processed_rows
-
-        return columns, rows
-    except Exception as e:
-        print(f"Query error: {e}")
-        # Return empty data on error
-        return columns, []
+        # Unmatched points fall back to coordinates, formatted in one bulk % operation
+        if misses:
+            coords = []
+            for k in misses:
+                coords += (lats[k], lngs[k])
+            fallbacks = (('%.5f, %.5f\n' * len(misses)) % tuple(coords)).split('\n')
+            for k, fallback in zip(misses, fallbacks):
+                locations[point_rows[k]] = fallback
 
+    return [tuple(row[:lat_idx]) + (location,) for row, location in zip(rows, locations)]
 
-def export_to_csv(columns, data):
-    """Export data to CSV format."""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(columns)
-    for row in data:
-        writer.writerow(row)
-    output.seek(0)
-    return output.getvalue()
+
+def stream_report_data(executor, project_email, report_id, start_date, end_date):
+    """
+    Like generate_report_data(), but returns (columns, rows) with rows as a one-shot
+    iterator streamed from the query, so exports never hold the whole result set.
+    Geofence locations are resolved REPORT_CHUNK_SIZE rows at a time. The iterator
+    uses the executor, so it must be consumed before the connection is released.
+    """
+    user = get_user_by_email(executor, project_email)
+    if not user:
+        return [], iter(())
+
+    user_id = user['id']
+
+    # Get report info
+    report_info = REPORTS_BY_ID.get(project_email, {}).get(report_id)
+    if not report_info:
+        return [], iter(())
+
+    columns, query, param_names, location_col_indices = build_report_query(report_info['name'].lower())
+    columns = list(columns)
+    param_values = {
+        'user_id': user_id,
+        'period_start': start_date,
+        'period_end': f'{end_date} 23:59:59',
+        'speed_pattern': '%speed%',
+    }
+    params = tuple(param_values[name] for name in param_names)
+
+    # Query errors propagate out of the iterator (possibly after some rows), so a failed
+    # query fails the export or preview instead of passing off partial data as complete
+    def report_rows():
+        rows = executor.iterrows(query, params)
+        if not location_col_indices:
+            yield from rows
+            return
+
+        # Post-process rows to resolve geofences, one chunk at a time
+        lat_idx, lng_idx = location_col_indices
+        geofences = None
+        while True:
+            chunk = list(islice(rows, REPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            if geofences is None:
+                geofences = load_geofences_for_user(executor, user_id)
+            yield from resolve_row_locations(chunk, lat_idx, lng_idx, geofences)
+
+    return columns, report_rows()
+
+
+def generate_report_data(executor, project_email, report_id, start_date, end_date):
+    """Generate report data based on report type."""
+    columns, rows = stream_report_data(executor, project_email, report_id, start_date, end_date)
+    return columns, list(rows)
+
+
+def export_to_csv(columns, data, out_path):
+    """Export data to a CSV file, streaming rows straight to disk."""
+    with open(out_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(data)
 
 
 def export_to_excel(columns, data):
-    """Export data to Excel format."""
-    df = pd.DataFrame(data, columns=columns)
+    """Export data to Excel format using a write-only (streaming) workbook."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, Border, Side
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+
+    # Bold, bordered, centred header row
+    thin = Side(style='thin')
+    header_font = Font(bold=True)
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_alignment = Alignment(horizontal='center', vertical='top')
+    header = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = header_font
+        cell.border = header_border
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    append_row = ws.append
+    for row in data:
+        append_row(row)
+
     output = io.BytesIO()
-    df.to_excel(output, index=False, engine='openpyxl')
+    wb.save(output)
     output.seek(0)
     return output
 
 
+def format_pdf_rows(rows):
+    """
+    Convert rows to lists of cell strings for a PDF table (falsy cells become '').
+
+    Works column by column: columns holding only strings/None (everything the
+    report SQL returns) skip the str() call, other columns get str().
+    """
+    formatted_columns = []
+    for values in zip(*rows):
+        if all(v is None or v.__class__ is str for v in values):
+            formatted_columns.append([v or '' for v in values])
+        else:
+            formatted_columns.append([str(v) if v else '' for v in values])
+    return [list(row) for row in zip(*formatted_columns)]
+
+
 def export_to_pdf(columns, data, title="Report"):
     """Export data to PDF format."""
     output = io.BytesIO()
@@ -1601,16 +2112,16 @@ def export_to_pdf(columns, data, title="Report"):
     elements.append(Spacer(1, 20))
 
     # Prepare table data
-    table_data = [columns]
-    for row in data[:500]:  # Limit to 500 rows for PDF
-        table_data.append([str(cell) if cell else '' for cell in row])
+    table_data = [columns] + format_pdf_rows(list(islice(data, PDF_MAX_ROWS)))  # Limit rows for PDF
 
     if len(table_data) > 1:
-        # Calculate column widths
-        col_count = len(columns)
-        col_width = 720 / col_count  # landscape letter width approx
+        # Size columns by their longest cell (header included, 4-40 chars) and
+        # scale them to the landscape letter width (approx 720pt)
+        char_widths = [min(max(max(map(len, col)), 4), 40) for col in zip(*table_data)]
+        total_chars = sum(char_widths)
+        col_widths = [720 * w / total_chars for w in char_widths]
 
-        table = Table(table_data, colWidths=[col_width] * col_count)
+        table = Table(table_data, colWidths=col_widths)
         table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -1660,6 +2171,7 @@ def run_trip_report_job(job_id, project_email, start_date, end_date, format_type
 
             # Export to file
             ext = {'csv': '.csv', 'excel': '.xlsx', 'pdf': '.pdf'}.get(format_type, '.csv')
+            project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
             if format_type == 'csv':
                 result_file = JOBS_DIR / f'{job_id}.csv'
                 content = export_trip_report_to_csv(trip_data, global_stats, start_date, end_date)
@@ -1671,32 +2183,37 @@ def run_trip_report_job(job_id, project_email, start_date, end_date, format_type
             elif format_type == 'pdf':
                 # For PDF, convert to flat table format
                 columns = ['Vehicle', 'Start Time', 'Stop Time', 'Duration', 'Location', 'Distance', 'Avg Speed', 'State']
-                rows = []
-                for vehicle in trip_data:
-                    for seg in vehicle['segments']:
-                        geofence_name = seg.get('geofence')
-                        lat = seg.get('start_lat', 0)
-                        lng = seg.get('start_lng', 0)
-                        if geofence_name:
-                            location = geofence_name
-                        elif lat and lng:
-                            location = f"{lat:.4f}, {lng:.4f}"
-                        else:
-                            location = ''
-
-                        rows.append([
-                            vehicle['device_name'],
-                            str(seg['start_time'])[:19] if seg.get('start_time') else '',
-                            str(seg['stop_time'])[:19] if seg.get('stop_time') else '',
-                            format_duration(seg.get('duration_seconds', 0)),
-                            location,
-                            round(seg.get('distance', 0), 2) if seg.get('state') == 'run' else '',
-                            round(seg.get('avg_speed', 0), 2) if seg.get('state') == 'run' else '',
-                            seg.get('state', '')
-                        ])
+                get_fields = itemgetter('start_time', 'stop_time', 'duration_seconds', 'start_lat',
+                                        'start_lng', 'geofence', 'distance', 'avg_speed', 'state')
+
+                def pdf_rows():
+                    for vehicle in trip_data:
+                        device_name = vehicle['device_name']
+                        for seg in vehicle['segments']:
+                            start, stop, duration, lat, lng, geofence_name, distance, avg_speed, state = get_fields(seg)
+                            if geofence_name:
+                                location = geofence_name
+                            elif lat and lng:
+                                location = f"{lat:.4f}, {lng:.4f}"
+                            else:
+                                location = ''
+
+                            is_run = state == 'run'
+                            yield [
+                                device_name,
+                                format_timestamp(start),
+                                format_timestamp(stop),
+                                format_duration(duration),
+                                location,
+                                round(distance, 2) if is_run else '',
+                                round(avg_speed, 2) if is_run else '',
+                                state
+                            ]
+
+                # Only the first PDF_MAX_ROWS rows are rendered, so stop building there
+                rows = list(islice(pdf_rows(), PDF_MAX_ROWS))
 
                 result_file = JOBS_DIR / f'{job_id}.pdf'
-                project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
                 title = f"{project_name} - Trip Report\n{start_date} to {end_date}"
                 content = export_to_pdf(columns, rows, title)
                 result_file.write_bytes(content.getvalue())
@@ -1709,7 +2226,6 @@ def run_trip_report_job(job_id, project_email, start_date, end_date, format_type
             email_error = None
             if recipient_email:
                 job_manager.update_progress(job_id, 90, 'sending_email')
-                project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
                 filename = f"Trip_Report_{start_date}_to_{end_date}{ext}"
                 subject = f"{project_name} - Trip Report ({start_date} to {end_date})"
                 body = f"""Your Trip Report is ready.
@@ -1727,13 +2243,8 @@ GPS Report Dashboard
                     recipient_email, subject, body, str(result_file), filename
                 )
 
-            job_manager.complete_job(job_id, str(result_file))
             # Store email status in job for frontend
-            job = job_manager._load_job(job_id)
-            job['email_sent'] = email_sent
-            job['email_recipient'] = recipient_email
-            job['email_error'] = email_error
-            job_manager._save_job(job_id, job)
+            job_manager.complete_job(job_id, str(result_file), email_sent, recipient_email, email_error)
             print(f"[Trip Report Job {job_id}] Completed successfully (email_sent={email_sent})")
 
     except Exception as e:
@@ -1771,6 +2282,7 @@ def run_fleet_summary_job(job_id, project_email, start_date, end_date, format_ty
 
             # Export to file
             ext = {'csv': '.csv', 'excel': '.xlsx', 'pdf': '.pdf'}.get(format_type, '.csv')
+            project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
             if format_type == 'csv':
                 result_file = JOBS_DIR / f'{job_id}.csv'
                 content = export_fleet_summary_to_csv(vehicle_data, global_stats, start_date, end_date)
@@ -1783,24 +2295,32 @@ def run_fleet_summary_job(job_id, project_email, start_date, end_date, format_ty
                 # For PDF, convert to flat table format
                 columns = ['Vehicle Info', 'Start Time', 'Stop Time', 'Driver TimeSheet',
                            'Total Idle', 'Total Trip', 'Distance', 'H-Accel', 'H-Brake', 'SeatBelt', 'SOS']
-                rows = []
-                for v in vehicle_data:
-                    rows.append([
-                        v['device_name'],
-                        str(v['start_time'])[:19] if v.get('start_time') else '',
-                        str(v['stop_time'])[:19] if v.get('stop_time') else '',
-                        format_hours(v['driver_timesheet']) if v['driver_timesheet'] else '',
-                        format_hours(v['total_idle_time']) if v['total_idle_time'] else 0,
-                        format_hours(v['total_trip_time']) if v['total_trip_time'] else 0,
-                        round(v['total_trip_distance'], 2) if v['total_trip_distance'] else 0,
-                        v['h_acceleration'],
-                        v['h_brake'],
-                        v['seatbelt'],
-                        v['sos']
-                    ])
+                get_fields = itemgetter('device_name', 'start_time', 'stop_time', 'driver_timesheet',
+                                        'total_idle_time', 'total_trip_time', 'total_trip_distance',
+                                        'h_acceleration', 'h_brake', 'seatbelt', 'sos')
+
+                def pdf_rows():
+                    for v in vehicle_data:
+                        (name, start, stop, timesheet, idle_time, trip_time, trip_distance,
+                         h_accel, h_brake, seatbelt, sos) = get_fields(v)
+                        yield [
+                            name,
+                            format_timestamp(start),
+                            format_timestamp(stop),
+                            format_hours(timesheet) if timesheet else '',
+                            format_hours(idle_time) if idle_time else 0,
+                            format_hours(trip_time) if trip_time else 0,
+                            round(trip_distance, 2) if trip_distance else 0,
+                            h_accel,
+                            h_brake,
+                            seatbelt,
+                            sos
+                        ]
+
+                # Only the first PDF_MAX_ROWS rows are rendered, so stop building there
+                rows = list(islice(pdf_rows(), PDF_MAX_ROWS))
 
                 result_file = JOBS_DIR / f'{job_id}.pdf'
-                project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
                 title = f"{project_name} - Fleet Summary\n{start_date} to {end_date}"
                 content = export_to_pdf(columns, rows, title)
                 result_file.write_bytes(content.getvalue())
@@ -1813,7 +2333,6 @@ def run_fleet_summary_job(job_id, project_email, start_date, end_date, format_ty
             email_error = None
             if recipient_email:
                 job_manager.update_progress(job_id, 90, 'sending_email')
-                project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
                 filename = f"Fleet_Summary_{start_date}_to_{end_date}{ext}"
                 subject = f"{project_name} - Fleet Summary ({start_date} to {end_date})"
                 body = f"""Your Fleet Summary Report is ready.
@@ -1831,13 +2350,8 @@ GPS Report Dashboard
                     recipient_email, subject, body, str(result_file), filename
                 )
 
-            job_manager.complete_job(job_id, str(result_file))
             # Store email status in job for frontend
-            job = job_manager._load_job(job_id)
-            job['email_sent'] = email_sent
-            job['email_recipient'] = recipient_email
-            job['email_error'] = email_error
-            job_manager._save_job(job_id, job)
+            job_manager.complete_job(job_id, str(result_file), email_sent, recipient_email, email_error)
 
     except Exception as e:
         job_manager.fail_job(job_id, str(e))
@@ -1851,8 +2365,8 @@ def run_standard_report_job(job_id, project_email, report_id, report_name, start
             # Update progress: starting
             job_manager.update_progress(job_id, 10, 'processing')
 
-            # Generate report data
-            columns, rows = generate_report_data(executor, project_email, report_id, start_date, end_date)
+            # Stream report data straight into the export
+            columns, rows = stream_report_data(executor, project_email, report_id, start_date, end_date)
 
             # Update progress: exporting
             job_manager.update_progress(job_id, 80, 'exporting')
@@ -1863,8 +2377,7 @@ def run_standard_report_job(job_id, project_email, report_id, report_name, start
 
             if format_type == 'csv':
                 result_file = JOBS_DIR / f'{job_id}.csv'
-                content = export_to_csv(columns, rows)
-                result_file.write_text(content)
+                export_to_csv(columns, rows, result_file)
             elif format_type == 'excel':
                 result_file = JOBS_DIR / f'{job_id}.xlsx'
                 content = export_to_excel(columns, rows)
@@ -1874,6 +2387,7 @@ def run_standard_report_job(job_id, project_email, report_id, report_name, start
                 project_name = PROJECTS.get(project_email, {}).get('name', 'Unknown')
                 title = f"{project_name} - {report_name}\n{start_date} to {end_date}"
                 content = export_to_pdf(columns, rows, title)
+                rows.close()  # PDF only reads the first PDF_MAX_ROWS rows; stop the query stream
                 result_file.write_bytes(content.getvalue())
             else:
                 job_manager.fail_job(job_id, f'Invalid format: {format_type}')
@@ -1902,13 +2416,8 @@ GPS Report Dashboard
                     recipient_email, subject, body, str(result_file), filename
                 )
 
-            job_manager.complete_job(job_id, str(result_file))
             # Store email status in job for frontend
-            job = job_manager._load_job(job_id)
-            job['email_sent'] = email_sent
-            job['email_recipient'] = recipient_email
-            job['email_error'] = email_error
-            job_manager._save_job(job_id, job)
+            job_manager.complete_job(job_id, str(result_file), email_sent, recipient_email, email_error)
             print(f"[Standard Report Job {job_id}] Completed successfully (email_sent={email_sent})")
 
     except Exception as e:
@@ -1919,6 +2428,85 @@ GPS Report Dashboard
         job_manager.fail_job(job_id, error_msg)
 
 
+# Parsed JSON data files: path -> ((mtime_ns, size), data)
+json_file_cache = {}
+
+
+def load_json_cached(path, build=None):
+    """
+    Load a JSON file, re-parsing it only when its mtime or size changes.
+
+    If build is given it is applied to the parsed data and its result is cached instead.
+    The cached object is shared between requests, so callers must not modify it.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = json_file_cache.get(str(path))
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if build:
+        data = build(data)
+    json_file_cache[str(path)] = (version, data)
+    return data
+
+
+def index_unified_devices(data):
+    """Precompute the device subsets the dashboard endpoints need from unified_devices.json."""
+    all_devices = data.get('devices', [])
+
+    # One pass collects the devices with SIM data (ICCID present), the first project
+    # email seen for each project name, and the projects that have SIM data
+    sim_devices = []
+    email_by_project = {}
+    sim_projects = {}
+    for d in all_devices:
+        email, name = d.get('project_email'), d.get('project_name')
+        if d.get('iccid'):
+            sim_devices.append(d)
+            if email and name:
+                sim_projects.setdefault(email, name)
+        if email and name:
+            email_by_project.setdefault(name, email)
+
+    return {
+        'data': data,
+        'all_devices': all_devices,
+        'sim_devices': sim_devices,
+        # Projects listed in the statistics, keyed by email (for /api/cross-reference)
+        'available_projects': {
+            email_by_project[project]: project
+            for project in data.get('statistics', {}).get('by_project', {})
+            if project != 'Unassigned' and project in email_by_project
+        },
+        # Projects that have SIM data, keyed by email (for /api/sim-insight)
+        'sim_projects': sim_projects,
+    }
+
+
+@app.after_request
+def compress_response(response):
+    """Gzip JSON responses for clients that accept it (device lists run to megabytes)."""
+    if (response.mimetype != 'application/json'
+            or response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
 def login_required(f):
     """Decorator to require authentication for routes."""
     @wraps(f)
@@ -2036,6 +2624,14 @@ def debug_vehicle_status(project_email):
         return jsonify({'error': str(e)}), 500
 
 
+def parse_report_date(value):
+    """Return a report date given as 'YYYY-MM-DD' in that canonical form, or None if invalid."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
 @app.route('/api/generate', methods=['POST'])
 @login_required
 def generate_report():
@@ -2043,14 +2639,15 @@ def generate_report():
     data = request.json
     project_email = data.get('project')
     report_id = int(data.get('report_id'))
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
+    start_date = parse_report_date(data.get('start_date'))
+    end_date = parse_report_date(data.get('end_date'))
     format_type = data.get('format', 'csv')
     recipient_email = data.get('email', '').strip() or None
+    if not (start_date and end_date):
+        return jsonify({'error': 'start_date and end_date must be dates in YYYY-MM-DD format'}), 400
 
     # Get report name for filename
-    reports = REPORTS.get(project_email, [])
-    report_info = next((r for r in reports if r['id'] == report_id), None)
+    report_info = REPORTS_BY_ID.get(project_email, {}).get(report_id)
     report_name = report_info['name'] if report_info else 'report'
 
     # All reports now go through background job queue
@@ -2064,13 +2661,8 @@ def generate_report():
             'email': recipient_email
         })
 
-        # Start background thread
-        thread = threading.Thread(
-            target=run_trip_report_job,
-            args=(job_id, project_email, start_date, end_date, format_type, recipient_email)
-        )
-        thread.daemon = True
-        thread.start()
+        # Queue on the background job pool
+        job_pool.submit(run_trip_report_job, job_id, project_email, start_date, end_date, format_type, recipient_email)
 
         return jsonify({
             'job_id': job_id,
@@ -2088,13 +2680,8 @@ def generate_report():
             'email': recipient_email
         })
 
-        # Start background thread
-        thread = threading.Thread(
-            target=run_fleet_summary_job,
-            args=(job_id, project_email, start_date, end_date, format_type, recipient_email)
-        )
-        thread.daemon = True
-        thread.start()
+        # Queue on the background job pool
+        job_pool.submit(run_fleet_summary_job, job_id, project_email, start_date, end_date, format_type, recipient_email)
 
         return jsonify({
             'job_id': job_id,
@@ -2113,13 +2700,8 @@ def generate_report():
             'email': recipient_email
         })
 
-        # Start background thread
-        thread = threading.Thread(
-            target=run_standard_report_job,
-            args=(job_id, project_email, report_id, report_name, start_date, end_date, format_type, recipient_email)
-        )
-        thread.daemon = True
-        thread.start()
+        # Queue on the background job pool
+        job_pool.submit(run_standard_report_job, job_id, project_email, report_id, report_name, start_date, end_date, format_type, recipient_email)
 
         return jsonify({
             'job_id': job_id,
@@ -2135,7 +2717,7 @@ def get_job_status(job_id):
     try:
         status = job_manager.get_status(job_id)
         return jsonify(status)
-    except FileNotFoundError:
+    except KeyError:
         return jsonify({'error': 'Job not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2169,24 +2751,37 @@ def download_job_result(job_id):
         end_date = params.get('end_date', '')
         download_name = f"Trip_Report_{start_date}__{end_date}{ext}"
 
-        return send_file(
+        # Repeat downloads of an unchanged result get 304 Not Modified
+        response = send_file(
             result_file,
             mimetype=mimetype,
             as_attachment=True,
-            download_name=download_name
+            download_name=download_name,
+            conditional=True,
+            etag=status.get('etag', True)
         )
-    except FileNotFoundError:
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
+    except KeyError:
         return jsonify({'error': 'Job not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def json_response(payload):
+    """
+    jsonify() without sorting keys. Sorting every device dict's keys was about 40% of
+    the encoding time for the device-list endpoints; any dict whose key order the page
+    shows must be built in the order wanted. The payload must be plain JSON data (it
+    comes from unified_devices.json), as it goes straight to the json module.
+    """
+    return Response(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+
+
 @app.route('/api/cross-reference')
 @login_required
 def get_cross_reference():
     """Get cross-reference device data with optional project filtering."""
-    import json as json_module
-
     project_filter = request.args.get('project')  # Optional project email filter
 
     try:
@@ -2195,10 +2790,9 @@ def get_cross_reference():
         if not json_path.exists():
             return jsonify({'error': 'Device data file not found. Run update_device_data.py first.'}), 404
 
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json_module.load(f)
-
-        all_devices = data.get('devices', [])
+        unified = load_json_cached(json_path, index_unified_devices)
+        data = unified['data']
+        all_devices = unified['all_devices']
         statistics = data.get('statistics', {})
 
         # Filter by project if specified
@@ -2207,21 +2801,11 @@ def get_cross_reference():
         else:
             devices = all_devices
 
-        # Get list of available projects
-        available_projects = {}
-        for project, count in statistics.get('by_project', {}).items():
-            if project != 'Unassigned':
-                # Find the email for this project name
-                for d in all_devices:
-                    if d.get('project_name') == project and d.get('project_email'):
-                        available_projects[d['project_email']] = project
-                        break
-
-        return jsonify({
+        return json_response({
             'devices': devices,
             'total': len(devices),
             'filtered_by': project_filter,
-            'available_projects': available_projects,
+            'available_projects': unified['available_projects'],
             'statistics': statistics,
             'generated_at': data.get('generated_at', '')
         })
@@ -2232,13 +2816,30 @@ def get_cross_reference():
         return jsonify({'error': str(e)}), 500
 
 
+# Last /api/sim-insight payload per project filter: filter -> (unified, traffic_json, payload)
+sim_insight_cache = {}
+
+
 @app.route('/api/sim-insight')
 @login_required
 def get_sim_insight():
-    """Get SIM insight data with usage information grouped by project."""
-    import json as json_module
+    """
+    Get SIM insight data with usage information grouped by project.
 
+    With ?page= (and optional page_size, default 200) only that page of devices is
+    returned; 'total' and the summaries still cover every device in the filter.
+    """
     project_filter = request.args.get('project')  # Optional project email filter
+    page = request.args.get('page', type=int)
+    page_size = request.args.get('page_size', 200, type=int)
+
+    def respond(payload):
+        if page is None:
+            return json_response(payload)
+        start_idx = max((page - 1) * page_size, 0)
+        end_idx = max(start_idx + page_size, start_idx)
+        return json_response(dict(payload, devices=payload['devices'][start_idx:end_idx],
+                                  page=page, page_size=page_size))
 
     try:
         # Load unified device data from JSON
@@ -2246,100 +2847,108 @@ def get_sim_insight():
         if not json_path.exists():
             return jsonify({'error': 'Device data file not found. Run update_device_data.py first.'}), 404
 
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json_module.load(f)
+        unified = load_json_cached(json_path, index_unified_devices)
+        data = unified['data']
 
         # Load traffic data if available
         traffic_path = Path(__file__).parent / "sim_traffic_data.json"
+        traffic_json = None
         traffic_data = {}
         data_limit_mb = 30  # Default 30MB limit
         if traffic_path.exists():
-            with open(traffic_path, 'r', encoding='utf-8') as f:
-                traffic_json = json_module.load(f)
-                traffic_data = traffic_json.get('traffic', {})
-                data_limit_mb = traffic_json.get('data_limit_mb', 30)
-
-        all_devices = data.get('devices', [])
-
-        # Filter to devices with SIM data (ICCID present)
-        sim_devices = [d for d in all_devices if d.get('iccid')]
-
-        # Merge traffic data with each device
-        for device in sim_devices:
-            iccid = device.get('iccid', '')
-            if iccid in traffic_data:
-                device['data_used_mb'] = traffic_data[iccid].get('total_data_mb', 0)
-                device['data_used_kb'] = traffic_data[iccid].get('total_data_kb', 0)
+            traffic_json = load_json_cached(traffic_path)
+            traffic_data = traffic_json.get('traffic', {})
+            data_limit_mb = traffic_json.get('data_limit_mb', 30)
+
+        # The response only depends on the filter and the two files: reuse it while
+        # load_json_cached() still returns the same parsed objects
+        cached = sim_insight_cache.get(project_filter)
+        if cached and cached[0] is unified and cached[1] is traffic_json:
+            return respond(cached[2])
+
+        # Filter by project if specified, before copying anything
+        sim_devices_in_scope = unified['sim_devices']
+        if project_filter:
+            sim_devices_in_scope = [d for d in sim_devices_in_scope if d.get('project_email') == project_filter]
+
+        # Merge traffic data with each SIM device (copies, the cached devices are shared)
+        sim_devices = []
+        for device in sim_devices_in_scope:
+            traffic = traffic_data.get(device.get('iccid', ''))
+            if traffic:
+                sim_devices.append(dict(device, data_used_mb=traffic.get('total_data_mb', 0),
+                                        data_used_kb=traffic.get('total_data_kb', 0)))
             else:
-                device['data_used_mb'] = 0
-                device['data_used_kb'] = 0
+                sim_devices.append(dict(device, data_used_mb=0, data_used_kb=0))
+
+        # Count devices per distinct (project, email, provider, SIM active, status) combination
+        # in one C-level Counter pass, then fold the few combinations into the summaries
+        combo_counts = Counter(
+            (d.get('project_name') or 'Unassigned', d.get('project_email', ''),
+             d.get('sim_provider') or 'Unknown', d.get('sim_status') == 'Active', d.get('status', 'Unknown'))
+            for d in sim_devices
+        )
 
-        # Filter by project if specified
-        if project_filter:
-            sim_devices = [d for d in sim_devices if d.get('project_email') == project_filter]
-
-        # Group by project for summary statistics
-        project_summary = {}
-        provider_summary = {}
-
-        for device in sim_devices:
-            project = device.get('project_name') or 'Unassigned'
-            provider = device.get('sim_provider') or 'Unknown'
-
-            # Project summary
-            if project not in project_summary:
-                project_summary[project] = {
-                    'project_email': device.get('project_email', ''),
-                    'total_sims': 0,
-                    'active': 0,
-                    'online': 0,
-                    'offline': 0,
-                    'by_provider': {}
-                }
-            project_summary[project]['total_sims'] += 1
-            if device.get('sim_status') == 'Active':
-                project_summary[project]['active'] += 1
-            if device.get('status') == 'Online':
-                project_summary[project]['online'] += 1
-            elif device.get('status') in ['Offline', 'Inactive']:
-                project_summary[project]['offline'] += 1
-
-            # Provider counts per project
-            if provider not in project_summary[project]['by_provider']:
-                project_summary[project]['by_provider'][provider] = 0
-            project_summary[project]['by_provider'][provider] += 1
-
-            # Overall provider summary
-            if provider not in provider_summary:
-                provider_summary[provider] = {
-                    'total': 0,
-                    'active': 0,
-                    'by_status': {'Online': 0, 'Recent': 0, 'Offline': 0, 'Inactive': 0}
+        # Fold the combinations into flat counters keyed by tuples
+        project_emails = {}
+        project_counts = Counter()
+        project_provider_counts = Counter()
+        provider_counts = Counter()
+        provider_status_counts = Counter()
+        for (project, project_email, provider, sim_active, status), n in combo_counts.items():
+            project_emails.setdefault(project, project_email)
+            project_counts[project, 'total_sims'] += n
+            project_provider_counts[project, provider] += n
+            provider_counts[provider, 'total'] += n
+            provider_status_counts[provider, status] += n
+            if sim_active:
+                project_counts[project, 'active'] += n
+                provider_counts[provider, 'active'] += n
+            if status == 'Online':
+                project_counts[project, 'online'] += n
+            elif status in OFFLINE_STATUSES:
+                project_counts[project, 'offline'] += n
+
+        # Build the nested summaries once, in name order: that is the order the page
+        # shows for projects/providers with equal counts and in the provider breakdown
+        providers = sorted({provider for _, _, provider, _, _ in combo_counts})
+        project_summary = {
+            project: {
+                'project_email': project_emails[project],
+                'total_sims': project_counts[project, 'total_sims'],
+                'active': project_counts[project, 'active'],
+                'online': project_counts[project, 'online'],
+                'offline': project_counts[project, 'offline'],
+                'by_provider': {
+                    provider: project_provider_counts[project, provider]
+                    for provider in providers if (project, provider) in project_provider_counts
                 }
-            provider_summary[provider]['total'] += 1
-            if device.get('sim_status') == 'Active':
-                provider_summary[provider]['active'] += 1
-            status = device.get('status', 'Unknown')
-            if status in provider_summary[provider]['by_status']:
-                provider_summary[provider]['by_status'][status] += 1
-
-        # Get list of available projects (that have SIM data)
-        available_projects = {}
-        for device in all_devices:
-            if device.get('iccid') and device.get('project_email') and device.get('project_name'):
-                if device['project_email'] not in available_projects:
-                    available_projects[device['project_email']] = device['project_name']
+            }
+            for project in sorted(project_emails)
+        }
+        provider_summary = {
+            provider: {
+                'total': provider_counts[provider, 'total'],
+                'active': provider_counts[provider, 'active'],
+                'by_status': {status: provider_status_counts[provider, status] for status in PROVIDER_STATUS_BUCKETS}
+            }
+            for provider in providers
+        }
 
-        return jsonify({
+        payload = {
             'devices': sim_devices,
             'total': len(sim_devices),
             'filtered_by': project_filter,
-            'available_projects': available_projects,
+            'available_projects': unified['sim_projects'],
             'project_summary': project_summary,
             'provider_summary': provider_summary,
             'data_limit_mb': data_limit_mb,
             'generated_at': data.get('generated_at', '')
-        })
+        }
+        # Only cache known filters, so arbitrary ?project= values can't grow the cache
+        if not project_filter or project_filter in unified['sim_projects']:
+            sim_insight_cache[project_filter] = (unified, traffic_json, payload)
+        return respond(payload)
 
     except FileNotFoundError:
         return jsonify({'error': 'Device data file not found'}), 404
@@ -2347,155 +2956,263 @@ def get_sim_insight():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/preview', methods=['POST'])
-@login_required
-def preview_report():
-    """Preview report data with pagination."""
-    data = request.json
-    project_email = data.get('project')
-    report_id = int(data.get('report_id'))
-    start_date = data.get('start_date')
-    end_date = data.get('end_date')
-    page = int(data.get('page', 1))
-    page_size = int(data.get('page_size', 50))
+def trip_preview_rows(trip_data, start, stop):
+    """
+    Format trip segments start..stop (counted across all vehicles) as preview table
+    rows. Vehicles entirely before the page are skipped by their segment count, so
+    only the rows on the page are formatted.
+    """
+    rows = []
+    offset = 0
+    for vehicle in trip_data:
+        if offset >= stop:
+            break
+        segments = vehicle['segments']
+        first = offset
+        offset += len(segments)
+        if offset <= start:
+            continue
+
+        for seg in segments[max(start - first, 0):stop - first]:
+            # Use geofence name if available, otherwise use coordinates
+            geofence_name = seg.get('geofence')
+            lat = seg.get('start_lat', 0)
+            lng = seg.get('start_lng', 0)
+            if geofence_name:
+                location = geofence_name
+            elif lat and lng:
+                location = f"{lat:.5f}, {lng:.5f}"
+            else:
+                location = ''
 
+            rows.append([
+                vehicle['device_name'],
+                format_timestamp(seg.get('start_time')),
+                format_timestamp(seg.get('stop_time')),
+                format_duration(seg.get('duration_seconds', 0)),
+                location,
+                round(seg.get('distance', 0), 3) if seg.get('state') == 'run' else '',
+                round(seg.get('avg_speed', 0), 1) if seg.get('state') == 'run' else '',
+                seg.get('state', '')
+            ])
+    return rows
+
+
+def fleet_preview_rows(vehicle_data, start, stop):
+    """Format fleet summary vehicles start..stop as preview table rows."""
+    return [
+        [
+            v['device_name'],
+            format_timestamp(v.get('start_time')),
+            format_timestamp(v.get('stop_time')),
+            round(format_hours(v['driver_timesheet']), 2) if v['driver_timesheet'] else '',
+            round(format_hours(v['total_idle_time']), 2) if v['total_idle_time'] else 0,
+            round(format_hours(v['total_trip_time']), 2) if v['total_trip_time'] else 0,
+            round(v['total_trip_distance'], 2) if v['total_trip_distance'] else 0,
+            v['h_acceleration'],
+            v['h_brake'],
+            v['seatbelt'],
+            v['sos']
+        ]
+        for v in vehicle_data[start:stop]
+    ]
+
+
+def build_preview_data(project_email, report_id, start_date, end_date):
+    """
+    Generate the data for a report preview as (columns, page_rows, total_rows, summary).
+    page_rows(start, stop) returns the table rows start..stop, so only the requested
+    page needs formatting. summary is None for standard reports.
+    Returns None if the project isn't found.
+    """
     # Special handling for Trip Report
     if report_id == 10:
-        try:
-            with get_db_connection() as executor:
-                user = get_user_by_email(executor, project_email)
-                if not user:
-                    return jsonify({'error': 'Project not found'}), 404
+        with get_db_connection() as executor:
+            user = get_user_by_email(executor, project_email)
+            if not user:
+                return None
 
-                trip_data, global_stats = generate_trip_report_data(
-                    executor, user['id'], start_date, end_date
-                )
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+            trip_data, global_stats = generate_trip_report_data(
+                executor, user['id'], start_date, end_date
+            )
 
         # Flatten trip data for preview
         columns = ['Vehicle', 'Start Time', 'Stop Time', 'Duration', 'Location', 'Distance (km)', 'Avg Speed (km/h)', 'State']
-        rows = []
-        for vehicle in trip_data:
-            for seg in vehicle['segments']:
-                # Use geofence name if available, otherwise use coordinates
-                geofence_name = seg.get('geofence')
-                lat = seg.get('start_lat', 0)
-                lng = seg.get('start_lng', 0)
-                if geofence_name:
-                    location = geofence_name
-                elif lat and lng:
-                    location = f"{lat:.5f}, {lng:.5f}"
-                else:
-                    location = ''
-
-                rows.append([
-                    vehicle['device_name'],
-                    str(seg['start_time'])[:19] if seg.get('start_time') else '',
-                    str(seg['stop_time'])[:19] if seg.get('stop_time') else '',
-                    format_duration(seg.get('duration_seconds', 0)),
-                    location,
-                    round(seg.get('distance', 0), 3) if seg.get('state') == 'run' else '',
-                    round(seg.get('avg_speed', 0), 1) if seg.get('state') == 'run' else '',
-                    seg.get('state', '')
-                ])
-
-        # Calculate pagination
-        total_rows = len(rows)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_rows = rows[start_idx:end_idx]
-
-        return jsonify({
-            'columns': columns,
-            'data': paginated_rows,
-            'total_rows': total_rows,
-            'page': page,
-            'page_size': page_size,
-            'summary': {
-                'total_vehicles': global_stats['total_vehicles'],
-                'total_distance': round(global_stats['total_distance'], 2),
-                'total_run_time': format_duration(global_stats['total_duration_run']),
-                'total_idle_time': format_duration(global_stats['total_duration_idle']),
-                'total_parked_time': format_duration(global_stats['total_duration_parked'])
-            }
-        })
+        total_rows = sum(len(vehicle['segments']) for vehicle in trip_data)
+        summary = {
+            'total_vehicles': global_stats['total_vehicles'],
+            'total_distance': round(global_stats['total_distance'], 2),
+            'total_run_time': format_duration(global_stats['total_duration_run']),
+            'total_idle_time': format_duration(global_stats['total_duration_idle']),
+            'total_parked_time': format_duration(global_stats['total_duration_parked'])
+        }
+        return columns, partial(trip_preview_rows, trip_data), total_rows, summary
 
     # Special handling for Fleet Summary Report
     if report_id == 11:
-        try:
-            with get_db_connection() as executor:
-                user = get_user_by_email(executor, project_email)
-                if not user:
-                    return jsonify({'error': 'Project not found'}), 404
+        with get_db_connection() as executor:
+            user = get_user_by_email(executor, project_email)
+            if not user:
+                return None
 
-                vehicle_data, global_stats = generate_fleet_summary_data(
-                    executor, user['id'], start_date, end_date
-                )
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+            vehicle_data, global_stats = generate_fleet_summary_data(
+                executor, user['id'], start_date, end_date
+            )
 
         # Format for preview
         columns = ['Vehicle Info', 'Start Time', 'Stop Time', 'Driver TimeSheet (h)',
                    'Idle Time (h)', 'Trip Time (h)', 'Trip Distance (km)',
                    'H-Accel', 'H-Brake', 'SeatBelt', 'SOS']
-        rows = []
-        for v in vehicle_data:
-            rows.append([
-                v['device_name'],
-                str(v['start_time'])[:19] if v.get('start_time') else '',
-                str(v['stop_time'])[:19] if v.get('stop_time') else '',
-                round(format_hours(v['driver_timesheet']), 2) if v['driver_timesheet'] else '',
-                round(format_hours(v['total_idle_time']), 2) if v['total_idle_time'] else 0,
-                round(format_hours(v['total_trip_time']), 2) if v['total_trip_time'] else 0,
-                round(v['total_trip_distance'], 2) if v['total_trip_distance'] else 0,
-                v['h_acceleration'],
-                v['h_brake'],
-                v['seatbelt'],
-                v['sos']
-            ])
+        summary = {
+            'total_vehicles': global_stats['total_vehicles'],
+            'total_seatbelt': global_stats['total_seatbelt'],
+            'total_sos': global_stats['total_sos'],
+            'total_h_brake': global_stats['total_h_brake'],
+            'total_h_accel': global_stats['total_h_accel']
+        }
+        return columns, partial(fleet_preview_rows, vehicle_data), len(vehicle_data), summary
 
-        # Calculate pagination
-        total_rows = len(rows)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_rows = rows[start_idx:end_idx]
+    # Standard report handling
+    with get_db_connection() as executor:
+        columns, rows = generate_report_data(executor, project_email, report_id, start_date, end_date)
+    return columns, lambda start, stop: rows[start:stop], len(rows), None
 
-        return jsonify({
-            'columns': columns,
-            'data': paginated_rows,
-            'total_rows': total_rows,
-            'page': page,
-            'page_size': page_size,
-            'summary': {
-                'total_vehicles': global_stats['total_vehicles'],
-                'total_seatbelt': global_stats['total_seatbelt'],
-                'total_sos': global_stats['total_sos'],
-                'total_h_brake': global_stats['total_h_brake'],
-                'total_h_accel': global_stats['total_h_accel']
-            }
-        })
 
-    # Standard report handling
+# Finished previews, least recently used first:
+# (project_email, report_id, start_date, end_date) -> (finished_at, Future, keep)
+# keep is False for results that must not be reused (ranges ending today or later,
+# missing projects, failures); those are only held until the next poll collects them.
+preview_cache = OrderedDict()
+# Previews still being generated in preview_pool: same key -> Future
+preview_futures = {}
+preview_cache_lock = threading.Lock()
+
+
+def finish_preview(key, end_date, future, collected=False):
+    """
+    Move a finished preview future from preview_futures into preview_cache.
+
+    Runs as the future's done callback, and again from the request that waited on the
+    future (collected=True), whichever comes first moves it. A result the waiting
+    request returns itself is not held for a later poll unless it may be reused.
+    """
+    import time
+
+    with preview_cache_lock:
+        if preview_futures.get(key) is future:
+            del preview_futures[key]
+            keep = (future.exception() is None and future.result() is not None
+                    and str(end_date) < datetime.now().strftime('%Y-%m-%d'))
+            if keep or not collected:
+                preview_cache[key] = (time.monotonic(), future, keep)
+                preview_cache.move_to_end(key)
+                while len(preview_cache) > PREVIEW_CACHE_SIZE:
+                    preview_cache.popitem(last=False)
+        elif collected:
+            cached = preview_cache.get(key)
+            if cached and cached[1] is future and not cached[2]:
+                del preview_cache[key]
+
+
+def get_preview_data(project_email, report_id, start_date, end_date):
+    """
+    Return (ready, preview) for a report preview, generating it in preview_pool so a
+    slow report doesn't hold the request thread. ready is False while generation is
+    still running (poll again); otherwise preview is the build_preview_data() result.
+
+    Finished previews are cached per process as soon as they complete, so paging
+    doesn't re-run the report queries. Entries expire PREVIEW_CACHE_TTL seconds after
+    they were built and at most PREVIEW_CACHE_SIZE are kept. Ranges ending today or
+    later still receive data, so they are only handed to the next poll, never reused.
+    The cached data is shared: don't modify it.
+    """
+    import time
+
+    key = (project_email, report_id, start_date, end_date)
+    submitted = None
+    with preview_cache_lock:
+        cached = preview_cache.get(key)
+        if cached and time.monotonic() - cached[0] >= PREVIEW_CACHE_TTL:
+            del preview_cache[key]
+            cached = None
+        if cached:
+            if cached[2]:
+                preview_cache.move_to_end(key)
+            else:
+                # Not reusable: only the first poll after it finished gets it
+                del preview_cache[key]
+        else:
+            future = preview_futures.get(key)
+            if future is None:
+                future = submitted = preview_pool.submit(build_preview_data, project_email, report_id, start_date, end_date)
+                preview_futures[key] = future
+
+    if cached:
+        return True, cached[1].result()
+
+    if submitted is not None:
+        # Registered outside the lock: an already finished future runs the callback here
+        submitted.add_done_callback(partial(finish_preview, key, end_date))
+
+    # Quick previews finish within this request; slow ones are picked up by a later poll
     try:
-        with get_db_connection() as executor:
-            columns, rows = generate_report_data(executor, project_email, report_id, start_date, end_date)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        preview = future.result(timeout=PREVIEW_WAIT_SECONDS)
+    except FutureTimeoutError:
+        return False, None
+    except Exception:
+        finish_preview(key, end_date, future, collected=True)
+        raise
+    finish_preview(key, end_date, future, collected=True)
+    return True, preview
 
-    # Calculate pagination
-    total_rows = len(rows)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    paginated_rows = rows[start_idx:end_idx]
 
-    return jsonify({
+@app.route('/api/preview', methods=['POST'])
+@login_required
+def preview_report():
+    """Preview report data with pagination."""
+    data = request.get_json(silent=True) or {}
+    project_email = data.get('project')
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    try:
+        report_id = int(data['report_id'])
+        page = int(data.get('page', 1))
+        page_size = int(data.get('page_size', 50))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'report_id, page and page_size must be integers'}), 400
+    if not (project_email and start_date and end_date):
+        return jsonify({'error': 'project, start_date and end_date are required'}), 400
+    # Dates end up inside SQL, so only well-formed ones are accepted
+    start_date, end_date = parse_report_date(start_date), parse_report_date(end_date)
+    if not (start_date and end_date):
+        return jsonify({'error': 'start_date and end_date must be dates in YYYY-MM-DD format'}), 400
+
+    try:
+        ready, preview = get_preview_data(project_email, report_id, start_date, end_date)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if not ready:
+        return jsonify({'status': 'pending'}), 202
+    if preview is None:
+        return jsonify({'error': 'Project not found'}), 404
+    columns, page_rows, total_rows, summary = preview
+
+    # Calculate pagination; only the rows on this page are formatted
+    start_idx = max((page - 1) * page_size, 0)
+    end_idx = max(start_idx + page_size, start_idx)
+    paginated_rows = page_rows(start_idx, end_idx)
+
+    result = {
+        'status': 'ready',
         'columns': columns,
         'data': paginated_rows,
         'total_rows': total_rows,
         'page': page,
         'page_size': page_size
-    })
+    }
+    if summary is not None:
+        result['summary'] = summary
+    return jsonify(result)
 
 
 if __name__ == '__main__':
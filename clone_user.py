@@ -15,11 +15,15 @@ Usage:
 """
 
 import argparse
+import binascii
 import os
+import re
 import sys
 import random
+import uuid
 from pathlib import Path
 from contextlib import contextmanager
+from functools import lru_cache
 
 try:
     import paramiko
@@ -76,35 +80,73 @@ EYE_FRIENDLY_COLORS = [
 ]
 
 
+# Tables whose column lists a clone needs
+CLONE_TABLES = ['users', 'device_groups', 'geofence_groups', 'devices', 'geofences', 'alerts']
+
+# Rows per multi-row INSERT statement (keeps statements well under max_allowed_packet)
+INSERT_BATCH_SIZE = 500
+
+# How the mysql client prints NULL in batch output
+NULL_VALUES = frozenset(('NULL', '\\N'))
+
+# Error lines the mysql client prints (e.g. "ERROR 1064 (42000) at line 1: ...")
+MYSQL_ERROR_LINE = re.compile(r'ERROR \d+ \(\w+\)')
+
+
+def sql_value(value):
+    """Render a Python value as a MySQL literal.
+
+    Strings are sent hex-encoded as utf8mb4 character literals, so no quoting or
+    escaping is needed and they still compare using the column collation.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return f"_utf8mb4 X'{binascii.hexlify(str(value).encode('utf-8')).decode('ascii')}'"
+
+
+def insert_template(table, columns):
+    """Build the INSERT prefix for a table once, plus a formatter for one row's VALUES tuple."""
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+
+    def format_row(values):
+        return '(' + ', '.join(map(sql_value, values)) + ')'
+
+    return prefix, format_row
+
+
 class ColorGenerator:
     """Generates unique eye-friendly colors without repetition."""
 
     def __init__(self):
-        self.used_colors = set()
+        # Only needed once the predefined colors run out (see get_next_color)
+        self.used_colors = None
         self.available_colors = list(EYE_FRIENDLY_COLORS)
         random.shuffle(self.available_colors)
 
     def get_next_color(self):
         """Get the next unique color. Generates new shades if all predefined colors are used."""
         if self.available_colors:
-            color = self.available_colors.pop()
-            self.used_colors.add(color)
-            return color
+            return self.available_colors.pop()
 
         # Generate a new unique color if we've exhausted the predefined list
+        if self.used_colors is None:
+            self.used_colors = set(EYE_FRIENDLY_COLORS)
         while True:
-            # Generate muted, eye-friendly colors (avoiding pure bright colors)
-            r = random.randint(60, 200)
-            g = random.randint(60, 200)
-            b = random.randint(60, 200)
-            color = f"#{r:02X}{g:02X}{b:02X}"
+            # Generate muted, eye-friendly colors (avoiding pure bright colors):
+            # one draw split into three channels in 60..200
+            rg, b = divmod(random.randrange(141 ** 3), 141)
+            r, g = divmod(rg, 141)
+            color = f"#{r + 60:02X}{g + 60:02X}{b + 60:02X}"
             if color not in self.used_colors:
                 self.used_colors.add(color)
                 return color
 
 
+@lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from .env file."""
+    """Load configuration from .env file (parsed once per process)."""
     env_path = Path(__file__).parent / ".env"
     load_dotenv(env_path)
 
@@ -138,9 +180,16 @@ class SSHMySQLExecutor:
         self.config = config
         self.ssh_client = None
         self.db_name = config["db_name"]
+        self._columns_cache = {}
+        self._session = None
+        self._stdin = None
+        # Marks the end of each query's output in the shared mysql session
+        self._end_marker = f"__END_{uuid.uuid4().hex}__"
+        # Separates result sets when several queries share one round trip
+        self._result_marker = f"__NEXT_{uuid.uuid4().hex}__"
 
     def connect(self):
-        """Establish SSH connection."""
+        """Establish SSH connection and start the mysql session used for all queries."""
         ssh_key_path = Path(__file__).parent / self.config["ssh_key"]
 
         print(f"Connecting to {self.config['ssh_server']} via SSH...")
@@ -151,63 +200,104 @@ class SSHMySQLExecutor:
             hostname=self.config["ssh_server"],
             username=self.config["ssh_user"],
             key_filename=str(ssh_key_path),
+            # Result sets are plain tab-separated text, which compresses well
+            compress=True,
         )
         print("SSH connection established")
 
+        # One long-lived mysql client reading queries from stdin, instead of a new SSH
+        # channel and mysql process per query. --force keeps it going after an error,
+        # -n flushes each result. stderr is redirected into stdout on the server, so error
+        # lines stay in write order with the results (merging the two SSH streams locally
+        # could deliver an error after the end marker of its query).
+        self._session = self.ssh_client.get_transport().open_session()
+        self._session.set_combine_stderr(True)
+        self._session.exec_command(f'sudo mysql --force -n -N -B {self.db_name} 2>&1')
+        self._stdin = self._session.makefile('wb')
+
     def close(self):
-        """Close SSH connection."""
+        """Close the mysql session and SSH connection."""
+        if self._session:
+            self._stdin.close()
+            self._session.close()
+            self._session = None
         if self.ssh_client:
             self.ssh_client.close()
             print("SSH connection closed")
 
     def execute(self, query, params=None):
         """Execute a query and return results as list of dicts."""
+        self.send(query, params)
+        return self.receive()
+
+    def send(self, query, params=None):
+        """Send a query to the mysql session without waiting for its output (see receive)."""
         if params:
-            # Escape parameters for shell safety
-            escaped_params = []
-            for p in params:
-                if p is None:
-                    escaped_params.append("NULL")
-                elif isinstance(p, (int, float)):
-                    escaped_params.append(str(p))
-                else:
-                    # Escape single quotes and backslashes for MySQL
-                    escaped = str(p).replace("\\", "\\\\").replace("'", "\\'")
-                    escaped_params.append(f"'{escaped}'")
-
-            # Replace %s placeholders with escaped params
-            for param in escaped_params:
-                query = query.replace("%s", param, 1)
-
-        # Execute via mysql CLI with tab-separated output
-        cmd = f'sudo mysql -N -B {self.db_name} -e "{query}"'
-
-        stdin, stdout, stderr = self.ssh_client.exec_command(cmd)
-        output = stdout.read().decode('utf-8', errors='replace')
-        error = stderr.read().decode('utf-8', errors='replace')
-
-        if error and "ERROR" in error:
-            raise Exception(f"MySQL Error: {error}")
-
-        return output
+            # Replace %s placeholders with literal params in one pass
+            parts = query.split("%s", len(params))
+            query = parts[0] + ''.join(sql_value(param) + part for param, part in zip(params, parts[1:]))
+
+        # Send the query and an end marker to the mysql session (tab-separated output)
+        query = query.strip().rstrip(';')
+        self._stdin.write(f"{query};\nSELECT '{self._end_marker}';\n".encode('utf-8'))
+        self._stdin.flush()
+
+    def receive(self):
+        """Wait for the output of the oldest sent query and return it as tab-separated text."""
+        # Read the session output (results and errors) in large chunks until the end marker line
+        marker = f"{self._end_marker}\n".encode('utf-8')
+        buf = bytearray()
+        while not (buf.endswith(marker) and (len(buf) == len(marker) or buf[-len(marker) - 1] == 0x0A)):
+            chunk = self._session.recv(65536)
+            if not chunk:
+                output = buf.decode('utf-8', errors='replace')
+                raise Exception(f"MySQL Error: session closed unexpectedly{': ' + output if output else ''}")
+            buf += chunk
+        del buf[-len(marker):]
+
+        lines = []
+        errors = []
+        # Output is newline-terminated, so the last split item is always empty
+        for line in buf.decode('utf-8', errors='replace').split('\n')[:-1]:
+            if MYSQL_ERROR_LINE.match(line):
+                errors.append(line)
+            else:
+                lines.append(line)
+
+        if errors:
+            message = '\n'.join(errors)
+            raise Exception(f"MySQL Error: {message}")
+
+        return ''.join(line + '\n' for line in lines)
 
     def fetchall(self, query, params=None):
         """Execute SELECT and return list of tuples."""
         output = self.execute(query, params)
-        if not output.strip():
-            return []
+        # Handle tab-separated values, converting NULL strings
+        return [
+            tuple(None if v in NULL_VALUES else v for v in line.split('\t'))
+            for line in output.split('\n') if line
+        ]
 
-        rows = []
-        for line in output.strip().split('\n'):
-            # Handle tab-separated values, converting NULL strings
-            values = []
-            for v in line.split('\t'):
-                if v == 'NULL' or v == '\\N':
-                    values.append(None)
-                else:
-                    values.append(v)
-            rows.append(tuple(values))
-        return rows
+    def fetchall_many(self, queries, params=None):
+        """Execute several SELECTs in one round trip and return a list of tuples per query.
+
+        params fill the %s placeholders across all queries in order.
+        """
+        separator = f"SELECT '{self._result_marker}';"
+        output = self.execute(
+            f"\n{separator}\n".join(q.strip().rstrip(';') + ';' for q in queries), params
+        )
+
+        results = [[]]
+        for line in output.split('\n'):
+            if not line:
+                continue
+            if line == self._result_marker:
+                results.append([])
+            else:
+                results[-1].append(tuple(None if v in NULL_VALUES else v for v in line.split('\t')))
+        return results
 
     def fetchone(self, query, params=None):
         """Execute SELECT and return first row as tuple."""
@@ -215,30 +305,31 @@ class SSHMySQLExecutor:
         return rows[0] if rows else None
 
     def get_columns(self, table):
-        """Get column names for a table."""
+        """Get column names for a table (looked up once per table per connection)."""
+        if table in self._columns_cache:
+            return self._columns_cache[table]
+
         output = self.execute(f"SHOW COLUMNS FROM {table}")
         columns = []
         for line in output.strip().split('\n'):
             if line:
                 columns.append(line.split('\t')[0])
+        self._columns_cache[table] = columns
         return columns
 
+    def prefetch_columns(self, tables):
+        """Look up column names for several tables in one round trip and cache them."""
+        missing = [table for table in tables if table not in self._columns_cache]
+        if not missing:
+            return
+        results = self.fetchall_many([f"SHOW COLUMNS FROM {table}" for table in missing])
+        for table, rows in zip(missing, results):
+            self._columns_cache[table] = [row[0] for row in rows]
+
     def insert(self, table, data):
         """Insert a row and return the last insert ID."""
-        columns = ', '.join(data.keys())
-
-        values = []
-        for v in data.values():
-            if v is None:
-                values.append("NULL")
-            elif isinstance(v, (int, float)):
-                values.append(str(v))
-            else:
-                escaped = str(v).replace("\\", "\\\\").replace("'", "\\'")
-                values.append(f"'{escaped}'")
-
-        values_str = ', '.join(values)
-        query = f"INSERT INTO {table} ({columns}) VALUES ({values_str}); SELECT LAST_INSERT_ID();"
+        prefix, format_row = insert_template(table, data.keys())
+        query = f"{prefix}{format_row(data.values())}; SELECT LAST_INSERT_ID();"
 
         output = self.execute(query)
         # Get the last insert ID from output
@@ -247,6 +338,41 @@ class SSHMySQLExecutor:
                 return int(line.strip())
         return None
 
+    def insert_many(self, table, columns, rows):
+        """Insert rows (value sequences ordered like columns) and return their new IDs in order.
+
+        A single multi-row INSERT gets consecutive auto-increment IDs starting at
+        LAST_INSERT_ID(), so one round trip per batch replaces one per row.
+        """
+        if not rows:
+            return []
+
+        prefix, format_row = insert_template(table, columns)
+        new_ids = []
+        in_flight = 0
+
+        for start in range(0, len(rows) + INSERT_BATCH_SIZE, INSERT_BATCH_SIZE):
+            batch = rows[start:start + INSERT_BATCH_SIZE]
+            if batch:
+                # Build this batch while the previous one is still on the wire
+                values_str = ', '.join(map(format_row, batch))
+                query = f"{prefix}{values_str}; SELECT LAST_INSERT_ID(), ROW_COUNT();"
+
+            if in_flight:
+                output = self.receive()
+                first_id, row_count = output.strip().split('\n')[-1].split('\t')
+                if int(row_count) != in_flight:
+                    raise Exception(f"MySQL Error: inserted {row_count} of {in_flight} rows into {table}")
+                new_ids.extend(range(int(first_id), int(first_id) + in_flight))
+
+            if not batch:
+                break
+            # Only send once the previous batch succeeded, so a failure stops the insert
+            self.send(query)
+            in_flight = len(batch)
+
+        return new_ids
+
 
 @contextmanager
 def get_db_connection(config):
@@ -268,39 +394,17 @@ def get_user_by_email(executor, email):
     return dict(zip(columns, user))
 
 
-def get_user_devices(executor, user_id):
-    """Fetch all devices/objects for a user."""
-    columns = executor.get_columns('devices')
-    rows = executor.fetchall("SELECT * FROM devices WHERE user_id = %s", (user_id,))
-    return [dict(zip(columns, row)) for row in rows]
-
-
-def get_user_device_groups(executor, user_id):
-    """Fetch all device groups for a user."""
-    columns = executor.get_columns('device_groups')
-    rows = executor.fetchall("SELECT * FROM device_groups WHERE user_id = %s", (user_id,))
-    return [dict(zip(columns, row)) for row in rows]
-
-
-def get_user_geofences(executor, user_id):
-    """Fetch all geofences for a user."""
-    columns = executor.get_columns('geofences')
-    rows = executor.fetchall("SELECT * FROM geofences WHERE user_id = %s", (user_id,))
-    return [dict(zip(columns, row)) for row in rows]
-
-
-def get_user_geofence_groups(executor, user_id):
-    """Fetch all geofence groups for a user."""
-    columns = executor.get_columns('geofence_groups')
-    rows = executor.fetchall("SELECT * FROM geofence_groups WHERE user_id = %s", (user_id,))
-    return [dict(zip(columns, row)) for row in rows]
-
+def get_user_tables(executor, user_id, tables):
+    """Fetch all rows for a user from several tables in one round trip.
 
-def get_user_alerts(executor, user_id):
-    """Fetch all alerts for a user."""
-    columns = executor.get_columns('alerts')
-    rows = executor.fetchall("SELECT * FROM alerts WHERE user_id = %s", (user_id,))
-    return [dict(zip(columns, row)) for row in rows]
+    Returns {table: (columns, rows)}.
+    """
+    columns = {table: executor.get_columns(table) for table in tables}
+    results = executor.fetchall_many(
+        [f"SELECT * FROM {table} WHERE user_id = %s" for table in tables],
+        (user_id,) * len(tables),
+    )
+    return {table: (columns[table], rows) for table, rows in zip(tables, results)}
 
 
 def get_alert_devices(executor, alert_id):
@@ -317,152 +421,190 @@ def get_alert_geofences(executor, alert_id):
     return [dict(zip(columns, row)) for row in rows]
 
 
-def clone_device_groups(executor, source_groups, target_user_id):
-    """Clone device groups and return mapping of old_id -> new_id."""
-    group_id_map = {}
+def prepare_clone_rows(columns, rows, target_user_id, remap_column=None, id_map=None):
+    """Copy source rows for insertion: drop id, set user_id and remap one foreign key column.
 
-    for group in source_groups:
-        old_id = group['id']
+    Returns (insert_columns, insert_rows) with rows as lists ordered like insert_columns.
+    """
+    id_idx = columns.index('id')
+    user_idx = columns.index('user_id')
+    remap_idx = columns.index(remap_column) if remap_column in columns else -1
+    insert_columns = [c for c in columns if c != 'id']
 
-        # Prepare insert data (exclude id, update user_id)
-        insert_data = {k: v for k, v in group.items() if k != 'id'}
-        insert_data['user_id'] = target_user_id
+    insert_rows = []
+    for row in rows:
+        values = list(row)
+        values[user_idx] = target_user_id
+        if remap_idx >= 0 and values[remap_idx]:
+            # ID maps are keyed by the raw string IDs fetchall returns
+            values[remap_idx] = id_map.get(values[remap_idx], values[remap_idx])
+        del values[id_idx]
+        insert_rows.append(values)
+    return insert_columns, insert_rows
 
-        new_id = executor.insert('device_groups', insert_data)
-        group_id_map[old_id] = new_id
-        print(f"  Cloned device group: {group.get('name', 'unnamed')} (ID: {old_id} -> {new_id})")
 
-    return group_id_map
+def row_namer(columns):
+    """Return a function giving a row's name column for log output."""
+    if 'name' not in columns:
+        return lambda row: 'unnamed'
+    name_idx = columns.index('name')
+    return lambda row: row[name_idx]
 
 
-def clone_geofence_groups(executor, source_groups, target_user_id):
-    """Clone geofence groups and return mapping of old_id -> new_id."""
+def clone_device_groups(executor, columns, source_groups, target_user_id):
+    """Clone device groups and return mapping of old_id -> new_id."""
     group_id_map = {}
+    id_idx = columns.index('id')
+    row_name = row_namer(columns)
+    log = []
+
+    insert_columns, rows = prepare_clone_rows(columns, source_groups, target_user_id)
+    new_ids = executor.insert_many('device_groups', insert_columns, rows)
+    for group, new_id in zip(source_groups, new_ids):
+        old_id = group[id_idx]
+        group_id_map[old_id] = new_id
+        log.append(f"  Cloned device group: {row_name(group)} (ID: {old_id} -> {new_id})")
 
-    for group in source_groups:
-        old_id = group['id']
+    # One write for the whole table instead of one print per row
+    if log:
+        print('\n'.join(log))
+    return group_id_map
 
-        # Prepare insert data (exclude id, update user_id)
-        insert_data = {k: v for k, v in group.items() if k != 'id'}
-        insert_data['user_id'] = target_user_id
 
-        new_id = executor.insert('geofence_groups', insert_data)
+def clone_geofence_groups(executor, columns, source_groups, target_user_id):
+    """Clone geofence groups and return mapping of old_id -> new_id."""
+    group_id_map = {}
+    id_idx = columns.index('id')
+    row_name = row_namer(columns)
+    log = []
+
+    insert_columns, rows = prepare_clone_rows(columns, source_groups, target_user_id)
+    new_ids = executor.insert_many('geofence_groups', insert_columns, rows)
+    for group, new_id in zip(source_groups, new_ids):
+        old_id = group[id_idx]
         group_id_map[old_id] = new_id
-        print(f"  Cloned geofence group: {group.get('name', 'unnamed')} (ID: {old_id} -> {new_id})")
+        log.append(f"  Cloned geofence group: {row_name(group)} (ID: {old_id} -> {new_id})")
 
+    if log:
+        print('\n'.join(log))
     return group_id_map
 
 
-def clone_devices(executor, source_devices, target_user_id, device_group_map):
+def clone_devices(executor, columns, source_devices, target_user_id, device_group_map):
     """Clone devices and return mapping of old_id -> new_id."""
     device_id_map = {}
+    id_idx = columns.index('id')
+    row_name = row_namer(columns)
+    log = []
 
-    for device in source_devices:
-        old_id = device['id']
-
-        # Prepare insert data (exclude id, update user_id and group_id)
-        insert_data = {k: v for k, v in device.items() if k != 'id'}
-        insert_data['user_id'] = target_user_id
-
-        # Map group_id to new group
-        if 'group_id' in insert_data and insert_data['group_id']:
-            old_group_id = int(insert_data['group_id']) if insert_data['group_id'] else None
-            insert_data['group_id'] = device_group_map.get(old_group_id, insert_data['group_id'])
-
-        new_id = executor.insert('devices', insert_data)
+    # Map group_id to new group
+    insert_columns, rows = prepare_clone_rows(
+        columns, source_devices, target_user_id, 'group_id', device_group_map
+    )
+    new_ids = executor.insert_many('devices', insert_columns, rows)
+    for device, new_id in zip(source_devices, new_ids):
+        old_id = device[id_idx]
         device_id_map[old_id] = new_id
-        print(f"  Cloned device: {device.get('name', 'unnamed')} (ID: {old_id} -> {new_id})")
+        log.append(f"  Cloned device: {row_name(device)} (ID: {old_id} -> {new_id})")
 
+    if log:
+        print('\n'.join(log))
     return device_id_map
 
 
-def clone_geofences(executor, source_geofences, target_user_id, geofence_group_map, color_generator):
+def clone_geofences(executor, columns, source_geofences, target_user_id, geofence_group_map, color_generator):
     """Clone geofences with randomized colors and return mapping of old_id -> new_id."""
     geofence_id_map = {}
+    id_idx = columns.index('id')
+    row_name = row_namer(columns)
+    log = []
 
-    for geofence in source_geofences:
-        old_id = geofence['id']
-
-        # Prepare insert data (exclude id, update user_id and group_id)
-        insert_data = {k: v for k, v in geofence.items() if k != 'id'}
-        insert_data['user_id'] = target_user_id
+    # Map group_id to new group
+    insert_columns, rows = prepare_clone_rows(
+        columns, source_geofences, target_user_id, 'group_id', geofence_group_map
+    )
 
-        # Assign new random eye-friendly color
+    # Assign new random eye-friendly color
+    if 'polygon_color' in insert_columns:
+        color_idx = insert_columns.index('polygon_color')
+    elif 'color' in insert_columns:
+        color_idx = insert_columns.index('color')
+    else:
+        color_idx = -1
+    colors = []
+    for values in rows:
         new_color = color_generator.get_next_color()
-        if 'polygon_color' in insert_data:
-            insert_data['polygon_color'] = new_color
-        elif 'color' in insert_data:
-            insert_data['color'] = new_color
+        if color_idx >= 0:
+            values[color_idx] = new_color
+        colors.append(new_color)
 
-        # Map group_id to new group
-        if 'group_id' in insert_data and insert_data['group_id']:
-            old_group_id = int(insert_data['group_id']) if insert_data['group_id'] else None
-            insert_data['group_id'] = geofence_group_map.get(old_group_id, insert_data['group_id'])
-
-        new_id = executor.insert('geofences', insert_data)
+    new_ids = executor.insert_many('geofences', insert_columns, rows)
+    for geofence, new_color, new_id in zip(source_geofences, colors, new_ids):
+        old_id = geofence[id_idx]
         geofence_id_map[old_id] = new_id
-        print(f"  Cloned geofence: {geofence.get('name', 'unnamed')} with color {new_color} (ID: {old_id} -> {new_id})")
+        log.append(f"  Cloned geofence: {row_name(geofence)} with color {new_color} (ID: {old_id} -> {new_id})")
 
+    if log:
+        print('\n'.join(log))
     return geofence_id_map
 
 
-def clone_alerts(executor, source_alerts, target_user_id, geofence_id_map):
+def clone_alerts(executor, columns, source_alerts, target_user_id, geofence_id_map):
     """Clone alerts and return mapping of old_id -> new_id."""
     alert_id_map = {}
+    id_idx = columns.index('id')
+    row_name = row_namer(columns)
+    log = []
 
-    for alert in source_alerts:
-        old_id = alert['id']
+    # Map geofence_id if present
+    insert_columns, rows = prepare_clone_rows(
+        columns, source_alerts, target_user_id, 'geofence_id', geofence_id_map
+    )
+    new_ids = executor.insert_many('alerts', insert_columns, rows)
+    for alert, new_id in zip(source_alerts, new_ids):
+        old_id = alert[id_idx]
+        alert_id_map[old_id] = new_id
+        log.append(f"  Cloned alert: {row_name(alert)} (ID: {old_id} -> {new_id})")
 
-        # Prepare insert data (exclude id, update user_id)
-        insert_data = {k: v for k, v in alert.items() if k != 'id'}
-        insert_data['user_id'] = target_user_id
+    if log:
+        print('\n'.join(log))
+    return alert_id_map
 
-        # Map geofence_id if present
-        if 'geofence_id' in insert_data and insert_data['geofence_id']:
-            old_geofence_id = int(insert_data['geofence_id']) if insert_data['geofence_id'] else None
-            insert_data['geofence_id'] = geofence_id_map.get(old_geofence_id, insert_data['geofence_id'])
 
-        new_id = executor.insert('alerts', insert_data)
-        alert_id_map[old_id] = new_id
-        print(f"  Cloned alert: {alert.get('name', 'unnamed')} (ID: {old_id} -> {new_id})")
+def sql_id_case(column, id_map):
+    """Build a CASE expression mapping old IDs in a column to their new IDs."""
+    whens = ' '.join(f"WHEN {int(old_id)} THEN {int(new_id)}" for old_id, new_id in id_map.items())
+    return f"CASE {column} {whens} END"
 
-    return alert_id_map
+
+def clone_assignments(executor, table, column, alert_id_map, id_map):
+    """Copy alert link rows to the cloned alerts in one INSERT ... SELECT."""
+    if not alert_id_map or not id_map:
+        return 0
+
+    alert_ids = ', '.join(str(int(old_id)) for old_id in alert_id_map)
+    linked_ids = ', '.join(str(int(old_id)) for old_id in id_map)
+    query = f"""
+        INSERT INTO {table} (alert_id, {column})
+        SELECT {sql_id_case('alert_id', alert_id_map)}, {sql_id_case(column, id_map)}
+        FROM {table}
+        WHERE alert_id IN ({alert_ids}) AND {column} IN ({linked_ids});
+        SELECT ROW_COUNT();
+    """
+    row = executor.fetchall(query)[-1]
+    return int(row[0])
 
 
 def clone_alert_device_assignments(executor, alert_id_map, device_id_map):
     """Clone alert-device assignments."""
-    for old_alert_id, new_alert_id in alert_id_map.items():
-        # Get original alert device assignments
-        columns = executor.get_columns('alert_device')
-        rows = executor.fetchall("SELECT * FROM alert_device WHERE alert_id = %s", (old_alert_id,))
-        assignments = [dict(zip(columns, row)) for row in rows]
-
-        for assignment in assignments:
-            old_device_id = assignment.get('device_id')
-            # Convert to int for comparison since data comes as strings
-            old_device_id_int = int(old_device_id) if old_device_id else None
-            if old_device_id_int and old_device_id_int in device_id_map:
-                new_device_id = device_id_map[old_device_id_int]
-                executor.insert('alert_device', {'alert_id': new_alert_id, 'device_id': new_device_id})
-                print(f"  Linked alert {new_alert_id} to device {new_device_id}")
+    count = clone_assignments(executor, 'alert_device', 'device_id', alert_id_map, device_id_map)
+    print(f"  Linked {count} alert-device assignments")
 
 
 def clone_alert_geofence_assignments(executor, alert_id_map, geofence_id_map):
     """Clone alert-geofence assignments."""
-    for old_alert_id, new_alert_id in alert_id_map.items():
-        # Get original alert geofence assignments
-        columns = executor.get_columns('alert_geofence')
-        rows = executor.fetchall("SELECT * FROM alert_geofence WHERE alert_id = %s", (old_alert_id,))
-        assignments = [dict(zip(columns, row)) for row in rows]
-
-        for assignment in assignments:
-            old_geofence_id = assignment.get('geofence_id')
-            # Convert to int for comparison since data comes as strings
-            old_geofence_id_int = int(old_geofence_id) if old_geofence_id else None
-            if old_geofence_id_int and old_geofence_id_int in geofence_id_map:
-                new_geofence_id = geofence_id_map[old_geofence_id_int]
-                executor.insert('alert_geofence', {'alert_id': new_alert_id, 'geofence_id': new_geofence_id})
-                print(f"  Linked alert {new_alert_id} to geofence {new_geofence_id}")
+    count = clone_assignments(executor, 'alert_geofence', 'geofence_id', alert_id_map, geofence_id_map)
+    print(f"  Linked {count} alert-geofence assignments")
 
 
 def discover_table_structure(executor, table_name):
@@ -497,6 +639,8 @@ def clone_user_data(source_email, target_email, dry_run=False, discover=False):
                 discover_table_structure(executor, table)
             return
 
+        executor.prefetch_columns(CLONE_TABLES)
+
         # Fetch source user
         print(f"\nLooking up source user: {source_email}")
         source_user = get_user_by_email(executor, source_email)
@@ -519,19 +663,24 @@ def clone_user_data(source_email, target_email, dry_run=False, discover=False):
         # Fetch all source data
         print("\n=== Fetching Source User Data ===")
 
-        device_groups = get_user_device_groups(executor, source_user_id)
+        source_data = get_user_tables(
+            executor, source_user_id,
+            ['device_groups', 'geofence_groups', 'devices', 'geofences', 'alerts'],
+        )
+
+        device_group_columns, device_groups = source_data['device_groups']
         print(f"  Device groups: {len(device_groups)}")
 
-        geofence_groups = get_user_geofence_groups(executor, source_user_id)
+        geofence_group_columns, geofence_groups = source_data['geofence_groups']
         print(f"  Geofence groups: {len(geofence_groups)}")
 
-        devices = get_user_devices(executor, source_user_id)
+        device_columns, devices = source_data['devices']
         print(f"  Devices/Objects: {len(devices)}")
 
-        geofences = get_user_geofences(executor, source_user_id)
+        geofence_columns, geofences = source_data['geofences']
         print(f"  Geofences: {len(geofences)}")
 
-        alerts = get_user_alerts(executor, source_user_id)
+        alert_columns, alerts = source_data['alerts']
         print(f"  Alerts: {len(alerts)}")
 
         if dry_run:
@@ -545,19 +694,19 @@ def clone_user_data(source_email, target_email, dry_run=False, discover=False):
 
         # Clone in order (dependencies first)
         print("\n=== Cloning Device Groups ===")
-        device_group_map = clone_device_groups(executor, device_groups, target_user_id)
+        device_group_map = clone_device_groups(executor, device_group_columns, device_groups, target_user_id)
 
         print("\n=== Cloning Geofence Groups ===")
-        geofence_group_map = clone_geofence_groups(executor, geofence_groups, target_user_id)
+        geofence_group_map = clone_geofence_groups(executor, geofence_group_columns, geofence_groups, target_user_id)
 
         print("\n=== Cloning Devices ===")
-        device_id_map = clone_devices(executor, devices, target_user_id, device_group_map)
+        device_id_map = clone_devices(executor, device_columns, devices, target_user_id, device_group_map)
 
         print("\n=== Cloning Geofences (with randomized colors) ===")
-        geofence_id_map = clone_geofences(executor, geofences, target_user_id, geofence_group_map, color_generator)
+        geofence_id_map = clone_geofences(executor, geofence_columns, geofences, target_user_id, geofence_group_map, color_generator)
 
         print("\n=== Cloning Alerts ===")
-        alert_id_map = clone_alerts(executor, alerts, target_user_id, geofence_id_map)
+        alert_id_map = clone_alerts(executor, alert_columns, alerts, target_user_id, geofence_id_map)
 
         print("\n=== Cloning Alert-Device Assignments ===")
         clone_alert_device_assignments(executor, alert_id_map, device_id_map)
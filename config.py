@@ -49,22 +49,22 @@ PROJECTS = {
 }
 
 # Standard reports for all projects (Device List + Overspeeding by category + Vehicle Status)
-STANDARD_REPORTS = [
+STANDARD_REPORTS = (
     {"id": 1, "name": "Device List", "description": "Current list of all devices with location"},
     {"id": 2, "name": "Bus Overspeeding Report", "description": "Overspeeding events for Bus vehicles"},
     {"id": 3, "name": "Heavy Overspeeding Report", "description": "Overspeeding events for Heavy vehicles"},
     {"id": 4, "name": "Light Overspeeding Report", "description": "Overspeeding events for Light vehicles"},
     {"id": 10, "name": "Trip Report", "description": "Vehicle trip status with Idle, Run & Parked segments"},
-]
+)
 
 # Phase 3 Package 8 has additional custom event reports
-PHASE3_PKG8_REPORTS = STANDARD_REPORTS + [
+PHASE3_PKG8_REPORTS = STANDARD_REPORTS + (
     {"id": 6, "name": "Seatbelt Violation Report", "description": "Seatbelt off while moving (>20 km/h)"},
     {"id": 7, "name": "SOS Alert Report", "description": "SOS emergency alerts"},
     {"id": 8, "name": "Harsh Braking Report", "description": "Harsh braking events"},
     {"id": 9, "name": "Harsh Acceleration Report", "description": "Harsh acceleration events"},
     {"id": 11, "name": "Fleet Summary Report", "description": "Daily fleet summary with vehicle times, distances, and event counts"},
-]
+)
 
 # All projects use standard reports, except phase3-pkg8 which has seatbelt
 REPORTS = {
@@ -78,3 +78,9 @@ REPORTS = {
     "hyundai-phase2-pkg2@wakecap.com": STANDARD_REPORTS,
     "phase3-pkg8@wakecap.com": PHASE3_PKG8_REPORTS,
 }
+
+# Report lookup by project email, then report id
+REPORTS_BY_ID = {
+    email: {report["id"]: report for report in reports}
+    for email, reports in REPORTS.items()
+}
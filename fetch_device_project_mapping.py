@@ -4,8 +4,11 @@ Fetch device-to-project mapping from GPSWox database.
 This creates a JSON file mapping each device IMEI to its project.
 """
 
+import atexit
 import json
 import os
+import uuid
+from collections import Counter
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -43,6 +46,63 @@ def load_config():
     return config
 
 
+# Connected SSH clients by (server, user, key path), reused across calls in this process
+ssh_clients = {}
+
+
+def get_ssh_client(server, user, key_filename):
+    """Return a connected SSH client, reusing an open one for the same server and user."""
+    key = (server, user, key_filename)
+    ssh_client = ssh_clients.get(key)
+    transport = ssh_client.get_transport() if ssh_client else None
+    if transport is not None and transport.is_active():
+        return ssh_client
+
+    ssh_client = paramiko.SSHClient()
+    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh_client.connect(hostname=server, username=user, key_filename=key_filename)
+    # Keep the cached connection from being dropped while idle
+    ssh_client.get_transport().set_keepalive(30)
+    ssh_clients[key] = ssh_client
+    return ssh_client
+
+
+@atexit.register
+def close_ssh_clients():
+    """Close cached SSH clients when the process exits."""
+    for ssh_client in ssh_clients.values():
+        ssh_client.close()
+    ssh_clients.clear()
+
+
+def run_mysql_queries(ssh_client, db_name, queries):
+    """
+    Run several queries in one mysql session and return each query's output lines.
+
+    The queries are sent on stdin to a single `sudo mysql` (one channel, one client
+    start-up), with a marker row selected after each so the output can be split per
+    query. Returns (results, error) where error is the session's stderr text.
+    """
+    marker = f"__END_{uuid.uuid4().hex}__"
+    script = ''.join(f"{query.strip().rstrip(';')};\nSELECT '{marker}';\n" for query in queries)
+
+    # -r: print values as-is (batch mode would otherwise escape their backslashes)
+    stdin, stdout, stderr = ssh_client.exec_command(f'sudo mysql -N -B -r {db_name}')
+    stdin.write(script)
+    stdin.channel.shutdown_write()
+    output = stdout.read().decode('utf-8', errors='replace')
+    error = stderr.read().decode('utf-8', errors='replace')
+
+    # mysql stops at the first failing query, so results may be missing from there on
+    results = [[]]
+    for line in output.split('\n'):
+        if line == marker:
+            results.append([])
+        elif line:
+            results[-1].append(line)
+    return results[:-1], error
+
+
 def fetch_device_project_mapping():
     """Fetch device-to-project mapping from GPSWox database."""
     config = load_config()
@@ -60,15 +120,8 @@ def fetch_device_project_mapping():
     # First we need to get user IDs for each project email
 
     print("Connecting to GPSWox server via SSH...")
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
     try:
-        ssh_client.connect(
-            hostname=config["ssh_server"],
-            username=config["ssh_user"],
-            key_filename=str(ssh_key_path),
-        )
+        ssh_client = get_ssh_client(config["ssh_server"], config["ssh_user"], str(ssh_key_path))
         print("Connected successfully!")
 
         # Build list of project emails to filter by
@@ -77,13 +130,15 @@ def fetch_device_project_mapping():
 
         # Query to get all devices with their project assignment
         # Only include users that are actual projects (from config)
+        # Each row comes back as one JSON object, so the output parses in a single json.loads
         query = f"""
-            SELECT
-                d.imei,
-                d.name as device_name,
-                u.email as project_email,
-                u.id as user_id,
-                dg.title as device_group
+            SELECT JSON_OBJECT(
+                'imei', d.imei,
+                'device_name', d.name,
+                'project_email', u.email,
+                'user_id', u.id,
+                'device_group', dg.title
+            )
             FROM devices d
             JOIN user_device_pivot udp ON d.id = udp.device_id
             JOIN users u ON udp.user_id = u.id
@@ -93,61 +148,47 @@ def fetch_device_project_mapping():
             ORDER BY u.email, d.imei
         """
 
-        cmd = f'sudo mysql -N -B {config["db_name"]} -e "{query}"'
         print("Executing query...")
-        stdin, stdout, stderr = ssh_client.exec_command(cmd)
-        output = stdout.read().decode('utf-8', errors='replace')
-        error = stderr.read().decode('utf-8', errors='replace')
+        results, error = run_mysql_queries(ssh_client, config["db_name"], [query])
 
         if error and "ERROR" in error:
             print(f"MySQL Error: {error}")
             return None
 
-        # Parse results
+        # Parse results (one JSON object per line)
+        rows = json.loads('[' + ','.join(results[0]) + ']')
+
+        # Project name and id per email, resolved once from config; emails not found there
+        # (the IN filter compares case-insensitively) keep the email as name and no id
+        project_info = {email: (info.get('name', email), info.get('id')) for email, info in PROJECTS.items()}
+
         device_mapping = {}
-        project_stats = {}
-
-        for line in output.strip().split('\n'):
-            if not line:
-                continue
-            parts = line.split('\t')
-            if len(parts) >= 4:
-                imei = parts[0]
-                device_name = parts[1] if parts[1] != 'NULL' else None
-                project_email = parts[2]
-                user_id = parts[3]
-                device_group = parts[4] if len(parts) > 4 and parts[4] != 'NULL' else None
-
-                # Get project info from config
-                project_info = PROJECTS.get(project_email, {})
-                project_name = project_info.get('name', project_email)
-
-                device_mapping[imei] = {
-                    'project_email': project_email,
-                    'project_name': project_name,
-                    'project_id': project_info.get('id'),
-                    'device_name': device_name,
-                    'device_group': device_group,
-                    'user_id': int(user_id) if user_id else None
-                }
-
-                # Count devices per project
-                if project_email not in project_stats:
-                    project_stats[project_email] = {'name': project_name, 'count': 0}
-                project_stats[project_email]['count'] += 1
+        for row in rows:
+            project_email = row['project_email']
+            project_name, project_id = project_info.get(project_email, (project_email, None))
+
+            device_mapping[row['imei']] = {
+                'project_email': project_email,
+                'project_name': project_name,
+                'project_id': project_id,
+                'device_name': row['device_name'],
+                'device_group': row['device_group'],
+                'user_id': row['user_id'],
+            }
+
+        # Count devices per project
+        project_counts = Counter(row['project_email'] for row in rows)
 
         print(f"\nFound {len(device_mapping)} devices mapped to projects:")
         print("-" * 50)
-        for email, stats in sorted(project_stats.items(), key=lambda x: -x[1]['count']):
-            print(f"  {stats['name']}: {stats['count']} devices")
+        for email, count in project_counts.most_common():
+            print(f"  {project_info.get(email, (email, None))[0]}: {count} devices")
 
         return device_mapping
 
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        ssh_client.close()
 
 
 def main():
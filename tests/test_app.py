@@ -0,0 +1,234 @@
+"""Tests for app.py helpers that don't need a live GPSWox server.
+
+Run with: python -m unittest discover -s tests
+"""
+
+import io
+import json
+import re
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app  # noqa: E402
+import numpy as np  # noqa: E402
+
+# Linux limit on a single command-line argument (MAX_ARG_STRLEN)
+MAX_ARG_STRLEN = 128 * 1024
+
+
+class FakeChannel:
+    """The parts of a paramiko channel the executor uses, answering with canned output."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.sql = b''
+        self.out = self.err = None
+        self.status = 0
+
+    def shutdown_write(self):
+        self.out, self.err, self.status = self.respond(self.sql.decode('utf-8'))
+
+    def recv_exit_status(self):
+        return self.status
+
+    def makefile(self, mode):
+        return io.BytesIO(self.out)
+
+    def close(self):
+        pass
+
+
+class FakeFile:
+    def __init__(self, channel, name):
+        self.channel = channel
+        self.name = name
+
+    def write(self, data):
+        self.channel.sql += data
+
+    def read(self):
+        return getattr(self.channel, self.name)
+
+
+class FakeSSHClient:
+    """Records each command and the SQL written to its stdin."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.commands = []
+        self.queries = []
+
+    def exec_command(self, cmd, timeout=None):
+        self.commands.append(cmd)
+        channel = FakeChannel(self.respond)
+        self.queries.append(channel)
+        return FakeFile(channel, 'sql'), FakeFile(channel, 'out'), FakeFile(channel, 'err')
+
+
+def make_executor(respond):
+    executor = app.SSHMySQLExecutor({'db_name': 'gpswox_web'})
+    executor.ssh_client = FakeSSHClient(respond)
+    return executor
+
+
+def fleet_database(sql):
+    """Answer the fleet summary's queries for a user with 100 devices."""
+    if 'FROM devices d' in sql:
+        rows = [f'{i}\tVehicle {i}\t35{i:013d}\tNULL' for i in range(1, 101)]
+    elif 'information_schema' in sql:
+        rows = re.findall(r"'(positions_\d+)'", sql)
+    elif 'as device_id' in sql:
+        rows = [f'{i}\t0\tNULL\tNULL\t0\t0\t0\t0\t0' for i in re.findall(r'(\d+) as device_id', sql)]
+    else:
+        rows = []
+    return ''.join(row + '\n' for row in rows).encode('utf-8'), b'', 0
+
+
+class SSHMySQLExecutorTests(unittest.TestCase):
+    def test_fleet_batch_query_is_sent_on_stdin(self):
+        executor = make_executor(fleet_database)
+        vehicles, stats = app.generate_fleet_summary_data(executor, 1, '2025-01-01', '2025-01-31')
+
+        self.assertEqual(stats['total_vehicles'], 100)
+        # The 100-device UNION ALL itself is over the argument limit...
+        fleet_sql = [q.sql for q in executor.ssh_client.queries if b'as device_id' in q.sql]
+        self.assertEqual(len(fleet_sql), 1)
+        self.assertGreater(len(fleet_sql[0]), MAX_ARG_STRLEN)
+        # ...so every command line must stay short, with the SQL going to stdin
+        for cmd in executor.ssh_client.commands:
+            self.assertLess(len(cmd.encode('utf-8')), MAX_ARG_STRLEN)
+            self.assertNotIn('-e', cmd.split())
+
+    def test_nonzero_exit_status_raises(self):
+        # e.g. the shell failing to start mysql prints no "ERROR"
+        executor = make_executor(lambda sql: (b'', b'bash: Argument list too long\n', 126))
+        with self.assertRaises(Exception):
+            executor.fetchall("SELECT 1")
+        with self.assertRaises(Exception):
+            list(executor.iterrows("SELECT 1"))
+
+    def test_failed_batch_is_retried_per_device(self):
+        def database(sql):
+            ids = re.findall(r'(\d+) as device_id', sql)
+            if ids and '7' in ids:
+                return b'', b"ERROR 1146 (42S02) at line 1: Table 'positions_7' doesn't exist\n", 1
+            return fleet_database(sql)
+
+        executor = make_executor(database)
+        vehicles, stats = app.generate_fleet_summary_data(executor, 1, '2025-01-01', '2025-01-31')
+
+        device_ids = {int(vehicle['device_id']) for vehicle in vehicles}
+        self.assertEqual(device_ids, set(range(1, 101)) - {7})
+
+
+class TripReportTests(unittest.TestCase):
+    def test_positions_are_fetched_per_device_in_time_order(self):
+        statements = []
+
+        def database(sql):
+            # Like the mysql client: run statements in order, stop at the first error
+            if 'FROM devices d' in sql:
+                return b''.join(f'{i}\tVehicle {i}\t35{i:013d}\tNULL\n'.encode() for i in range(1, 6)), b'', 0
+            if 'information_schema' in sql:
+                return ''.join(t + '\n' for t in re.findall(r"'(positions_\d+)'", sql)).encode(), b'', 0
+            if 'as device_id' not in sql:
+                return b'', b'', 0
+            out = ''
+            for statement in sql.split(';\n'):
+                if not statement.strip():
+                    continue
+                statements.append(statement)
+                device_id = re.search(r'(\d+) as device_id', statement).group(1)
+                if device_id == '3':
+                    return out.encode(), b"ERROR 1146 (42S02) at line 3: Table 'positions_3' doesn't exist\n", 1
+                for minute in range(3):
+                    out += f'{device_id}\t2025-01-01 08:0{minute}:00\t30\t26.3\t50.1\t0.5\ttrue\n'
+            return out.encode(), b'', 0
+
+        executor = make_executor(database)
+        trips, stats = app.generate_trip_report_data(executor, 1, '2025-01-01', '2025-01-01')
+
+        self.assertEqual(sorted(int(trip['device_id']) for trip in trips), [1, 2, 4, 5])
+        for statement in statements:
+            self.assertNotIn('UNION', statement)
+            self.assertRegex(statement, r'ORDER BY time ASC\s*;?\s*$')
+
+
+class GeofenceTests(unittest.TestCase):
+    def setUp(self):
+        app.geofence_cache.clear()
+
+    def load(self, rows):
+        def database(sql):
+            if 'COUNT(*)' in sql:
+                return b'1\tNULL\n', b'', 0
+            lines = ['\t'.join('NULL' if v is None else str(v) for v in row) for row in rows]
+            return ''.join(line + '\n' for line in lines).encode('utf-8'), b'', 0
+        return app.load_geofences_for_user(make_executor(database), 1)
+
+    def test_circle_center_stored_as_strings(self):
+        geofences = self.load([
+            (1, 'Yard', None, 'circle', '500', json.dumps({'lat': '26.3', 'lng': '50.1'})),
+            (2, 'Gate', None, 'circle', '100', json.dumps(['26.5', '50.5'])),
+        ])
+
+        self.assertEqual([gf['center'] for gf in geofences],
+                         [{'lat': 26.3, 'lng': 50.1}, {'lat': 26.5, 'lng': 50.5}])
+        lats, lngs = np.array([26.3001, 26.5, 10.0]), np.array([50.1001, 50.5, 10.0])
+        self.assertEqual(app.find_geofences_for_points(lats, lngs, geofences), ['Yard', 'Gate', None])
+        self.assertEqual(app.find_geofence_for_point(26.3001, 50.1001, geofences), 'Yard')
+
+    def test_circle_with_unusable_center_is_skipped(self):
+        geofences = self.load([
+            (1, 'Null center', None, 'circle', '500', json.dumps({'lat': None, 'lng': None})),
+            (2, 'Text center', None, 'circle', '500', json.dumps({'lat': 'north', 'lng': '50.1'})),
+            (3, 'Yard', None, 'circle', '500', json.dumps({'lat': 26.3, 'lng': 50.1})),
+        ])
+
+        self.assertEqual([gf['name'] for gf in geofences], ['Yard'])
+        lats, lngs = np.array([26.3]), np.array([50.1])
+        self.assertEqual(app.find_geofences_for_points(lats, lngs, geofences), ['Yard'])
+
+
+class PreviewRequestTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['logged_in'] = True
+        self.built = []
+        self.build_preview_data = app.build_preview_data
+        app.build_preview_data = lambda *args: self.built.append(args) or (['Column'], lambda start, stop: [], 0, None)
+        app.preview_cache.clear()
+
+    def tearDown(self):
+        app.build_preview_data = self.build_preview_data
+
+    def preview(self, start_date, end_date):
+        return self.client.post('/api/preview', json={
+            'project': 'fleet@example.com', 'report_id': 1,
+            'start_date': start_date, 'end_date': end_date,
+        })
+
+    def test_malformed_dates_are_rejected(self):
+        for start_date, end_date in [
+            ('2025-01-01" ; $(reboot) ; "', '2025-01-31'),
+            ('2025-01-01', "2025-01-31' OR '1'='1"),
+            ('01/01/2025', '2025-01-31'),
+            ('2025-02-30', '2025-03-01'),
+            (20250101, '2025-01-31'),
+        ]:
+            response = self.preview(start_date, end_date)
+            self.assertEqual(response.status_code, 400, (start_date, end_date))
+        self.assertEqual(self.built, [])
+
+    def test_valid_dates_are_accepted(self):
+        response = self.preview('2025-01-01', '2025-01-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.built, [('fleet@example.com', 1, '2025-01-01', '2025-01-31')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,32 +10,125 @@ Outputs: unified_devices.json
 
 import csv
 import json
+import re
+from collections import Counter
 from pathlib import Path
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from operator import itemgetter
+
+
+# FOTA CSV columns we keep, in the order load_fota_csv unpacks them
+FOTA_COLUMNS = (
+    'imei', 'model', 'current_configuration', 'current_firmware',
+    'description', 'seen_at', 'activity_status', 'task_queue',
+)
 
 
 def load_fota_csv(csv_path):
     """Load device data from FOTA CSV export."""
     devices = {}
     with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        width = len(header)
+        index = {name: i for i, name in enumerate(header)}
+
+        # Resolve column positions once; columns missing from the header read from an
+        # extra '' cell appended to each row (short rows are padded with None and extra
+        # cells dropped, as DictReader does)
+        get_fields = itemgetter(*(index.get(name, width) for name in FOTA_COLUMNS))
+
         for row in reader:
-            imei = row.get('imei', '').strip()
+            if not row:
+                continue
+            if len(row) != width:
+                row = row[:width] + [None] * (width - len(row))
+            row.append('')
+
+            imei, model, config, firmware, description, seen_at, activity_status, task_queue = get_fields(row)
+            imei = imei.strip()
             if imei:
                 devices[imei] = {
                     'imei': imei,
-                    'model': row.get('model', ''),
-                    'config': row.get('current_configuration', ''),
-                    'firmware': row.get('current_firmware', ''),
-                    'description': row.get('description', ''),
-                    'seen_at': row.get('seen_at', ''),
-                    'activity_status': row.get('activity_status', ''),
-                    'task_queue': row.get('task_queue', ''),
+                    'model': model,
+                    'config': config,
+                    'firmware': firmware,
+                    'description': description,
+                    'seen_at': seen_at,
+                    'activity_status': activity_status,
+                    'task_queue': task_queue,
                 }
     return devices
 
 
+class DeviceTableParser(HTMLParser):
+    """Collect the cell texts of each row in the body of <table id="deviceTable"> while parsing.
+
+    Rows are kept as lists of cell strings (whitespace-stripped text, as BeautifulSoup's
+    get_text(strip=True) gives); no document tree is built.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.found_table = False
+        self.found_tbody = False
+        self.table_depth = 0  # open <table> tags from deviceTable inwards
+        self.in_tbody = False
+        self.row = None
+        self.cell = None
+        self.text = []
+
+    def flush_text(self):
+        # Adjacent text pieces form one string, which is stripped as a whole
+        if self.text:
+            text = ''.join(self.text).strip()
+            if text:
+                self.cell.append(text)
+            self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.cell is not None:
+            self.flush_text()
+        if tag == 'table':
+            if self.table_depth:
+                self.table_depth += 1
+            elif not self.found_table and dict(attrs).get('id') == 'deviceTable':
+                self.found_table = True
+                self.table_depth = 1
+        elif tag == 'tbody':
+            if self.table_depth and not self.found_tbody:
+                self.found_tbody = True
+                self.in_tbody = True
+        elif self.in_tbody:
+            if tag == 'tr':
+                self.row = []
+                self.rows.append(self.row)
+            elif tag == 'td' and self.row is not None:
+                self.cell = []
+                self.row.append(self.cell)
+
+    def handle_endtag(self, tag):
+        if self.cell is not None:
+            self.flush_text()
+        if tag == 'table' and self.table_depth:
+            self.table_depth -= 1
+            if not self.table_depth:
+                self.in_tbody = False
+        elif tag == 'tbody' and self.in_tbody:
+            self.in_tbody = False
+            self.row = self.cell = None
+        elif tag == 'tr':
+            self.row = self.cell = None
+        elif tag == 'td':
+            self.cell = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.text.append(data)
+
+
 def load_sim_data_from_html(html_path):
     """Extract SIM data from existing HTML cross-reference."""
     sim_data = {}
@@ -44,30 +137,31 @@ def load_sim_data_from_html(html_path):
         print(f"Warning: HTML file not found at {html_path}")
         return sim_data
 
+    # Stream the file through the parser instead of building a full document tree
+    parser = DeviceTableParser()
     with open(html_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+        for chunk in iter(lambda: f.read(65536), ''):
+            parser.feed(chunk)
+    parser.close()
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    table = soup.find('table', id='deviceTable')
-
-    if not table:
+    if not parser.found_table:
         print("Warning: Device table not found in HTML")
         return sim_data
 
-    tbody = table.find('tbody')
-    if not tbody:
+    if not parser.found_tbody:
         print("Warning: Table body not found")
         return sim_data
 
-    for row in tbody.find_all('tr'):
-        cells = row.find_all('td')
-        if len(cells) >= 12:
-            imei = cells[1].get_text(strip=True)
+    get_sim_cells = itemgetter(1, 7, 8, 9, 10)
+    for row in parser.rows:
+        if len(row) >= 12:
+            # Only the IMEI and SIM columns are read, so only their text pieces are joined
+            imei, sim_provider, sim_status, iccid, msisdn = map(''.join, get_sim_cells(row))
             sim_data[imei] = {
-                'sim_provider': cells[7].get_text(strip=True),
-                'sim_status': cells[8].get_text(strip=True),
-                'iccid': cells[9].get_text(strip=True),
-                'msisdn': cells[10].get_text(strip=True),
+                'sim_provider': sim_provider,
+                'sim_status': sim_status,
+                'iccid': iccid,
+                'msisdn': msisdn,
             }
 
     return sim_data
@@ -83,19 +177,38 @@ def load_project_mapping(mapping_path):
         return json.load(f)
 
 
-def calculate_status(seen_at, activity_status):
-    """Calculate device status based on last seen time."""
+# seen_at values in the usual '%Y-%m-%d %H:%M:%S' layout (parsed with fromisoformat)
+SEEN_AT_PATTERN = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}')
+
+
+def parse_seen_at(seen_at):
+    """Parse the '%Y-%m-%d %H:%M:%S' timestamp at the start of a FOTA seen_at value."""
+    value = seen_at[:19]
+    if SEEN_AT_PATTERN.fullmatch(value):
+        return datetime.fromisoformat(value)
+    # Anything else goes through strptime, which also accepts e.g. single-digit fields
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+
+def calculate_status(seen_at, activity_status, online_cutoff=None, recent_cutoff=None):
+    """Calculate device status based on last seen time.
+
+    The cutoffs (now - 24 hours, now - 30 days) can be passed in when classifying
+    many devices against the same current time.
+    """
     if activity_status == 'Inactive' or not seen_at:
         return 'Inactive'
 
     try:
-        seen_dt = datetime.strptime(seen_at[:19], '%Y-%m-%d %H:%M:%S')
-        now = datetime.now()
-        diff = now - seen_dt
+        seen_dt = parse_seen_at(seen_at)
+        if online_cutoff is None:
+            now = datetime.now()
+            online_cutoff = now - timedelta(hours=24)
+            recent_cutoff = now - timedelta(days=30)
 
-        if diff < timedelta(hours=24):
+        if seen_dt > online_cutoff:
             return 'Online'
-        elif diff < timedelta(days=30):
+        elif seen_dt > recent_cutoff:
             return 'Recent'
         else:
             return 'Offline'
@@ -103,49 +216,64 @@ def calculate_status(seen_at, activity_status):
         return activity_status or 'Unknown'
 
 
+# Configs naming the primary/GPSWox server; ASCII-only case folding matches what
+# comparing against config.lower() accepted (e.g. 'ſ' must not match 's')
+CORRECT_CONFIG_PATTERN = re.compile(r'primary|gpswox', re.IGNORECASE | re.ASCII)
+
+
 def get_config_status(config):
     """Determine if config is correct, wrong, or none."""
     if not config:
         return 'None'
-    config_lower = config.lower()
-    if 'primary' in config_lower or 'gpswox' in config_lower:
+    if CORRECT_CONFIG_PATTERN.search(config):
         return 'Correct'
     return 'Wrong'
 
 
+# Stand-ins for devices missing from the SIM data or the project mapping; they carry
+# every field merge_device_data reads, so records can be indexed directly
+EMPTY_SIM = {'sim_provider': '', 'sim_status': '', 'iccid': '', 'msisdn': ''}
+EMPTY_PROJECT = {'project_email': '', 'project_name': '', 'device_name': '', 'device_group': ''}
+
+
 def merge_device_data(fota_devices, sim_data, project_mapping):
     """Merge all data sources into unified device list."""
     unified = []
+    # Every FOTA device yields a row (left join), so FOTA drives the loop and the
+    # other two sides are probed; misses share the read-only EMPTY_* records
+    now = datetime.now()
+    online_cutoff = now - timedelta(hours=24)
+    recent_cutoff = now - timedelta(days=30)
 
     for imei, fota in fota_devices.items():
-        sim = sim_data.get(imei, {})
-        project = project_mapping.get(imei, {})
+        sim = sim_data.get(imei, EMPTY_SIM)
+        project = project_mapping.get(imei, EMPTY_PROJECT)
 
-        status = calculate_status(fota.get('seen_at'), fota.get('activity_status'))
-        config_status = get_config_status(fota.get('config'))
+        status = calculate_status(fota['seen_at'], fota['activity_status'], online_cutoff, recent_cutoff)
+        config_status = get_config_status(fota['config'])
 
         # Determine if device is in GPSWox (has project mapping)
-        in_gpswox = 'Yes' if project.get('project_email') else 'No'
+        in_gpswox = 'Yes' if project['project_email'] else 'No'
 
         device = {
             'imei': imei,
-            'model': fota.get('model', ''),
+            'model': fota['model'],
             'status': status,
-            'activity_status': fota.get('activity_status', ''),
+            'activity_status': fota['activity_status'],
             'in_gpswox': in_gpswox,
-            'gpswox_name': project.get('device_name', ''),
-            'config': fota.get('config', '') or 'None',
+            'gpswox_name': project['device_name'],
+            'config': fota['config'] or 'None',
             'config_status': config_status,
-            'firmware': fota.get('firmware', ''),
-            'sim_provider': sim.get('sim_provider', '') or 'Unknown',
-            'sim_status': sim.get('sim_status', ''),
-            'iccid': sim.get('iccid', ''),
-            'msisdn': sim.get('msisdn', ''),
-            'last_seen': fota.get('seen_at', ''),
-            'project_email': project.get('project_email', ''),
-            'project_name': project.get('project_name', ''),
-            'device_group': project.get('device_group', ''),
-            'task_queue': fota.get('task_queue', ''),
+            'firmware': fota['firmware'],
+            'sim_provider': sim['sim_provider'] or 'Unknown',
+            'sim_status': sim['sim_status'],
+            'iccid': sim['iccid'],
+            'msisdn': sim['msisdn'],
+            'last_seen': fota['seen_at'],
+            'project_email': project['project_email'],
+            'project_name': project['project_name'],
+            'device_group': project['device_group'],
+            'task_queue': fota['task_queue'],
         }
         unified.append(device)
 
@@ -157,40 +285,41 @@ def merge_device_data(fota_devices, sim_data, project_mapping):
 
 def generate_statistics(devices):
     """Generate summary statistics."""
-    stats = {
-        'total': len(devices),
-        'by_status': {},
-        'by_project': {},
-        'by_sim_provider': {},
-        'by_config': {},
-        'in_gpswox': 0,
-        'not_in_gpswox': 0,
-    }
+    in_gpswox = sum(1 for d in devices if d.get('in_gpswox') == 'Yes')
 
-    for d in devices:
+    return {
+        'total': len(devices),
         # Status counts
-        status = d.get('status', 'Unknown')
-        stats['by_status'][status] = stats['by_status'].get(status, 0) + 1
-
+        'by_status': Counter(d.get('status', 'Unknown') for d in devices),
         # Project counts
-        project = d.get('project_name') or 'Unassigned'
-        stats['by_project'][project] = stats['by_project'].get(project, 0) + 1
-
+        'by_project': Counter(d.get('project_name') or 'Unassigned' for d in devices),
         # SIM provider counts
-        provider = d.get('sim_provider') or 'Unknown'
-        stats['by_sim_provider'][provider] = stats['by_sim_provider'].get(provider, 0) + 1
-
+        'by_sim_provider': Counter(d.get('sim_provider') or 'Unknown' for d in devices),
         # Config counts
-        config_status = d.get('config_status', 'None')
-        stats['by_config'][config_status] = stats['by_config'].get(config_status, 0) + 1
-
+        'by_config': Counter(d.get('config_status', 'None') for d in devices),
         # GPSWox counts
-        if d.get('in_gpswox') == 'Yes':
-            stats['in_gpswox'] += 1
-        else:
-            stats['not_in_gpswox'] += 1
+        'in_gpswox': in_gpswox,
+        'not_in_gpswox': len(devices) - in_gpswox,
+    }
 
-    return stats
+
+def write_output(output_path, output_data):
+    """Write output_data as indented JSON, with each entry of 'devices' on one compact line."""
+    header = {key: value for key, value in output_data.items() if key != 'devices'}
+    # The indented encoder is pure Python; devices go through the C encoder one at a time
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    devices = output_data['devices']
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        # Reopen the indented header object (drop its closing '\n}') to append the device list
+        f.write(json.dumps(header, indent=2)[:-2])
+        f.write(',\n  "devices": [')
+        separator = '\n    '
+        for device in devices:
+            f.write(separator)
+            f.write(encode(device))
+            separator = ',\n    '
+        f.write('\n  ]\n}' if devices else ']\n}')
 
 
 def main():
@@ -240,8 +369,7 @@ def main():
     }
 
     print(f"\n5. Saving to: {output_path}")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2)
+    write_output(output_path, output_data)
 
     # Print summary
     print("\n" + "=" * 60)
@@ -250,19 +378,19 @@ def main():
     print(f"\nTotal Devices: {stats['total']}")
 
     print("\nBy Status:")
-    for status, count in sorted(stats['by_status'].items(), key=lambda x: -x[1]):
+    for status, count in stats['by_status'].most_common():
         print(f"  {status}: {count}")
 
     print("\nBy Project:")
-    for project, count in sorted(stats['by_project'].items(), key=lambda x: -x[1])[:10]:
+    for project, count in stats['by_project'].most_common(10):
         print(f"  {project}: {count}")
 
     print("\nBy SIM Provider:")
-    for provider, count in sorted(stats['by_sim_provider'].items(), key=lambda x: -x[1]):
+    for provider, count in stats['by_sim_provider'].most_common():
         print(f"  {provider}: {count}")
 
     print("\nConfig Status:")
-    for config, count in sorted(stats['by_config'].items(), key=lambda x: -x[1]):
+    for config, count in stats['by_config'].most_common():
         print(f"  {config}: {count}")
 
     print(f"\nIn GPSWox: {stats['in_gpswox']}")